@@ -0,0 +1,148 @@
+"""
+Background weather alert pipeline.
+
+Streams subscribed users in location order, fetches the forecast once per
+location through a bounded thread pool, checks the alert rules and writes
+matching alerts to the WeatherAlert outbox table. Run it with
+
+    flask --app app send-weather-alerts [--every 1800]
+
+or `python alerts.py`.
+"""
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import select, tuple_
+
+from app import app, db, User, WeatherAlert, dialect_insert, get_weather_grid
+
+# Hours of forecast (3-hour slots) the rules look at
+ALERT_WINDOW_HOURS = 24
+
+
+def evaluate_rules(grid):
+    """
+    Return (kind, message) pairs for the alert rules triggered by a forecast grid
+    """
+    slots = max(1, ALERT_WINDOW_HOURS // 3)
+    # An empty forecast triggers nothing; one location's bad data must not stop the run
+    if not grid['time'][:slots]:
+        return []
+    rain = sum(grid['rain'][:slots])
+    hottest = max(grid['temp_max'][:slots])
+    coldest = min(grid['temp_min'][:slots])
+    windiest = max(grid['wind'][:slots]) * 3.6  # m/s to km/h
+
+    alerts = []
+    if rain >= app.config['ALERT_HEAVY_RAIN_MM']:
+        alerts.append(('heavy_rain', f'Heavy rain expected: {rain:.0f} mm in the next 24 hours. '
+                                     'Clear field drainage and postpone spraying.'))
+    if hottest >= app.config['ALERT_HEAT_C']:
+        alerts.append(('heat', f'Heat alert: up to {hottest:.0f}°C in the next 24 hours. '
+                               'Irrigate in the early morning or evening.'))
+    if coldest <= app.config['ALERT_COLD_C']:
+        alerts.append(('cold', f'Cold alert: down to {coldest:.0f}°C in the next 24 hours. '
+                               'Protect nurseries and young plants from frost.'))
+    if windiest >= app.config['ALERT_WIND_KMH']:
+        alerts.append(('wind', f'Strong winds up to {windiest:.0f} km/h expected. '
+                               'Stake tall crops and avoid spraying.'))
+    return alerts
+
+
+def stream_subscriber_groups(batch_size):
+    """
+    Yield (farm_location, [user ids]) for subscribed users. The user table is
+    read in keyset batches ordered by (farm_location, id), so users of one
+    location arrive together and memory use does not grow with the table.
+    Large locations are yielded in several chunks of at most `batch_size` ids.
+    """
+    last = ('', 0)
+    location, user_ids = None, []
+    while True:
+        rows = db.session.execute(
+            select(User.farm_location, User.id)
+            .where(User.subscription.is_(True), User.farm_location.isnot(None), User.farm_location != '')
+            .where(tuple_(User.farm_location, User.id) > last)
+            .order_by(User.farm_location, User.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        for row_location, user_id in rows:
+            if user_ids and (row_location != location or len(user_ids) >= batch_size):
+                yield location, user_ids
+                user_ids = []
+            location = row_location
+            user_ids.append(user_id)
+        last = tuple(rows[-1])
+
+    if user_ids:
+        yield location, user_ids
+
+
+def queue_alerts(location, user_ids, grid):
+    """
+    Write the alerts triggered for one location to the outbox.
+    Returns the number of rows written.
+    """
+    alerts = evaluate_rules(grid)
+    if not alerts:
+        return 0
+
+    alert_date = datetime.utcfromtimestamp(grid['time'][0] + grid['timezone']).date()
+    now = datetime.utcnow()
+    rows = [
+        {'user_id': user_id, 'location': location, 'kind': kind, 'message': message,
+         'alert_date': alert_date, 'created_at': now}
+        for kind, message in alerts
+        for user_id in user_ids
+    ]
+    # Re-runs on the same day must not queue duplicates
+    result = db.session.execute(
+        dialect_insert(WeatherAlert.__table__).on_conflict_do_nothing(), rows
+    )
+    db.session.commit()
+    return max(result.rowcount, 0)
+
+
+def run_alert_pipeline(batch_size=1000, concurrency=8):
+    """
+    Run the pipeline once and return counts of what it did
+    """
+    started = time.monotonic()
+    stats = {'users': 0, 'locations': 0, 'alerts': 0}
+    # Forecasts are fetched ahead of the DB writes, but never more than this
+    # many groups are held in memory at once
+    max_in_flight = concurrency * 2
+    in_flight = deque()
+
+    def drain_one():
+        location, user_ids, future = in_flight.popleft()
+        grid = future.result()
+        if grid is not None:
+            stats['alerts'] += queue_alerts(location, user_ids, grid)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='alerts') as executor:
+        previous_location = None
+        for location, user_ids in stream_subscriber_groups(batch_size):
+            stats['users'] += len(user_ids)
+            if location != previous_location:
+                stats['locations'] += 1
+                previous_location = location
+            # Chunks of one location share a single upstream call via the weather cache
+            in_flight.append((location, user_ids, executor.submit(get_weather_grid, location)))
+            if len(in_flight) >= max_in_flight:
+                drain_one()
+        while in_flight:
+            drain_one()
+
+    stats['seconds'] = time.monotonic() - started
+    return stats
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        print(run_alert_pipeline())
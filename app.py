@@ -1,13 +1,36 @@
 
+import base64
+import hashlib
+import json
 import os
-from flask import Flask, render_template, url_for, redirect, request, flash, jsonify
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from flask import Flask, render_template, url_for, redirect, request, flash, jsonify, g, session, has_request_context
+from flask import before_render_template, template_rendered
+from markupsafe import Markup
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, func, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import contains_eager, joinedload, selectinload, make_transient_to_detached
 from flask_login import UserMixin, login_user, LoginManager, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
+import click
 import requests
 from dotenv import load_dotenv
 from flask_migrate import Migrate
+from cache import FragmentCacheExtension, StaleWhileRevalidateCache, create_cache, memoize
+from weather_client import WeatherClient, WeatherUnavailable
+from instrumentation import QueryCounter
+from search import create_search_index, rebuild_search_index, search_forum, product_matches, SEARCH_TABLES
+from assets import build_assets, init_assets
+from compression import CompressionMiddleware, ROUTE_ENVIRON_KEY, DEFAULT_MIMETYPES
+from metrics import MetricsRegistry, Counter, Histogram
+from engine_profiles import select_profile, engine_options, install_engine_profile, check_engine_profile, describe_engine_profile
+from replicas import RoutingSession, replica_binds, replica_engines, wrote_primary, copy_sqlite_database
+from passwords import (LoginThrottle, hash_password, verify_password, needs_rehash, time_method, tune_method,
+                       DEFAULT_METHOD)
 
 load_dotenv()
 
@@ -15,18 +38,217 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///farmers.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# auto (from the database URL), sqlite, postgres or none; see engine_profiles.py
+app.config['DB_ENGINE_PROFILE'] = os.getenv('DB_ENGINE_PROFILE', 'auto')
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+# Per worker process: at most DB_POOL_SIZE + DB_MAX_OVERFLOW PostgreSQL connections each
+app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 5))
+app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', 10))
+app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+# 0 turns the PostgreSQL statement timeout off, e.g. for a long migration
+app.config['DB_STATEMENT_TIMEOUT_MS'] = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000))
+app.config['DB_ENGINE_PROFILE'] = select_profile(app.config['SQLALCHEMY_DATABASE_URI'], app.config['DB_ENGINE_PROFILE'])
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['DB_ENGINE_PROFILE'], app.config)
+# Comma-separated replica database URLs (same backend as DATABASE_URL) that read-only views read from
+app.config['DATABASE_REPLICA_URLS'] = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+# Seconds a client reads from the primary after changing something; keep it above the replicas' lag
+app.config['REPLICA_STICKY_SECONDS'] = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+app.config['SQLALCHEMY_BINDS'] = replica_binds(
+    app.config['DATABASE_REPLICA_URLS'], lambda url: engine_options(app.config['DB_ENGINE_PROFILE'], app.config))
+# memory:// (per worker), sqlite:////path/cache.db (shared per host) or redis://host:port/db
+app.config['CACHE_URL'] = os.getenv('CACHE_URL', 'memory://?max_entries=2048')
+app.config['FRAGMENT_CACHE_TTL'] = int(os.getenv('FRAGMENT_CACHE_TTL', 300))
+app.config['FORUM_COUNT_CACHE_TTL'] = int(os.getenv('FORUM_COUNT_CACHE_TTL', 300))
+app.config['PAGE_CACHE_TTL'] = int(os.getenv('PAGE_CACHE_TTL', 3600))
+# Category counts are dropped whenever a product changes; the TTL only limits staleness from outside writes
+app.config['CATALOG_FACET_CACHE_TTL'] = int(os.getenv('CATALOG_FACET_CACHE_TTL', 3600))
+app.config['SHOP_PAGE_SIZE'] = int(os.getenv('SHOP_PAGE_SIZE', 24))
+# Seconds a stored API response is kept for replay to retries with the same Idempotency-Key
+app.config['IDEMPOTENCY_KEY_TTL'] = int(os.getenv('IDEMPOTENCY_KEY_TTL', 86400))
+# Seconds the signed-in user's profile is served from the cache instead of the database
+app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 60))
+# Responses of these types and at least this many bytes are gzip/brotli compressed
+app.config['COMPRESS_MIMETYPES'] = os.getenv('COMPRESS_MIMETYPES', ','.join(DEFAULT_MIMETYPES)).split(',')
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+app.config['COMPRESS_LEVEL'] = int(os.getenv('COMPRESS_LEVEL', 6))
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+# Directory where gunicorn workers share their /metrics totals (set by gunicorn.conf.py);
+# without one, /metrics only covers the worker that answers
+app.config['METRICS_DIR'] = os.getenv('METRICS_DIR')
+app.config['METRICS_FLUSH_INTERVAL'] = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+# Werkzeug method string for new password hashes; `flask tune-password-hash` suggests one for this
+# machine. Older hashes are replaced with this one when their owner next signs in
+app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+# Failed sign-ins allowed per client address and per username within the window (seconds)
+app.config['LOGIN_MAX_FAILURES_PER_IP'] = int(os.getenv('LOGIN_MAX_FAILURES_PER_IP', 20))
+app.config['LOGIN_MAX_FAILURES_PER_USER'] = int(os.getenv('LOGIN_MAX_FAILURES_PER_USER', 5))
+app.config['LOGIN_FAILURE_WINDOW'] = int(os.getenv('LOGIN_FAILURE_WINDOW', 900))
+
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+with app.app_context():
+    for engine in [db.engine] + replica_engines(db):
+        install_engine_profile(engine, app.config['DB_ENGINE_PROFILE'], app.config)
+
+def describe_database():
+    """
+    Startup log lines naming the engine profile in use and the settings of the
+    primary and each replica
+    """
+    with app.app_context():
+        return '\n'.join(describe_engine_profile(engine, app.config['DB_ENGINE_PROFILE'], app.config)
+                         for engine in [db.engine] + replica_engines(db))
+
+def replica_reads(view):
+    """
+    Let a read-only view read from a replica, unless this client changed
+    something within REPLICA_STICKY_SECONDS and the replica may not have it yet
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('primary_reads_until', 0) <= time.time():
+            db.session().use_replica()
+        return view(*args, **kwargs)
+    return wrapper
 
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)  # Add this line
+@app.after_request
+def keep_writers_on_primary(response):
+    if app.config['DATABASE_REPLICA_URLS'] and wrote_primary(db.session()):
+        session['primary_reads_until'] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+def include_in_migrations(object, name, type_, reflected, compare_to):
+    """
+    Keep the full-text search tables, which search.py manages, out of autogenerate
+    """
+    return not (type_ == 'table' and name in SEARCH_TABLES)
+
+migrate = Migrate(app, db, include_object=include_in_migrations)  # Add this line
 
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+app_cache = create_cache(app.config['CACHE_URL'])
+app.jinja_env.add_extension(FragmentCacheExtension)
+app.jinja_env.fragment_cache = app_cache
+app.jinja_env.fragment_cache_ttl = app.config['FRAGMENT_CACHE_TTL']
+login_throttle = LoginThrottle(app_cache, app.config['LOGIN_MAX_FAILURES_PER_IP'],
+                               app.config['LOGIN_MAX_FAILURES_PER_USER'], app.config['LOGIN_FAILURE_WINDOW'])
+# Fingerprinted, precompressed static files once `flask build-assets` has run
+init_assets(app)
+
+compression = CompressionMiddleware(
+    app.wsgi_app,
+    mimetypes=[mimetype.strip() for mimetype in app.config['COMPRESS_MIMETYPES']],
+    min_size=app.config['COMPRESS_MIN_SIZE'],
+    gzip_level=app.config['COMPRESS_LEVEL'],
+    brotli_quality=app.config['COMPRESS_BROTLI_QUALITY']
+)
+app.wsgi_app = compression
+
+@app.before_request
+def record_route():
+    # Lets the compression middleware group response sizes by route
+    if request.url_rule is not None:
+        request.environ[ROUTE_ENVIRON_KEY] = request.url_rule.rule
+
+
+metrics_registry = MetricsRegistry(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+request_count = Counter(metrics_registry, 'http_requests_total',
+                        'Requests served', ['route', 'method', 'status'])
+request_seconds = Histogram(metrics_registry, 'http_request_duration_seconds',
+                            'Time from routing the request to returning the response', ['route', 'method'])
+request_db_statements = Histogram(metrics_registry, 'http_request_db_statements',
+                                  'SQL statements run per request', ['route'],
+                                  buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 25, 50))
+request_db_seconds = Histogram(metrics_registry, 'http_request_db_seconds',
+                               'Time spent in SQL statements per request', ['route'])
+weather_api_seconds = Histogram(metrics_registry, 'weather_api_request_seconds',
+                                'OpenWeatherMap calls, by outcome (ok, error, skipped by the circuit breaker)',
+                                ['endpoint', 'outcome'])
+template_seconds = Histogram(metrics_registry, 'template_render_seconds',
+                             'Jinja render time per template', ['template'])
+
+def metrics_route():
+    return request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.db_statements = 0
+    g.db_seconds = 0.0
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_started' in g:
+        route = metrics_route()
+        request_count.inc(route=route, method=request.method, status=response.status_code)
+        request_seconds.observe(time.perf_counter() - g.request_started, route=route, method=request.method)
+        request_db_statements.observe(g.db_statements, route=route)
+        request_db_seconds.observe(g.db_seconds, route=route)
+    metrics_registry.maybe_flush()
+    return response
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_started = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_statement_metrics(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'db_statements' in g:
+        g.db_statements += 1
+        g.db_seconds += time.perf_counter() - context.metrics_started
+
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    g.setdefault('template_started', []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def record_template_metrics(sender, template, context, **extra):
+    started = g.template_started.pop()
+    template_seconds.observe(time.perf_counter() - started, template=template.name)
+
 
 # Weather API Configuration
 WEATHER_API_KEY = os.getenv('WEATHER_API_KEY', 'c755f4d85a3789cc9d3a47a524309386')
-WEATHER_BASE_URL = "http://api.openweathermap.org/data/2.5/weather"
+WEATHER_API_URL = os.getenv('WEATHER_API_URL', 'https://api.openweathermap.org/data/2.5')
+
+weather_client = WeatherClient(
+    WEATHER_API_KEY,
+    WEATHER_API_URL,
+    connect_timeout=float(os.getenv('WEATHER_CONNECT_TIMEOUT', 2)),
+    read_timeout=float(os.getenv('WEATHER_READ_TIMEOUT', 5)),
+    pool_maxsize=int(os.getenv('WEATHER_POOL_SIZE', 32)),
+    failure_threshold=int(os.getenv('WEATHER_BREAKER_FAILURES', 5)),
+    reset_timeout=int(os.getenv('WEATHER_BREAKER_RESET', 30))
+)
+
+# Bounded pool used by the batch weather API to look up locations concurrently
+app.config['WEATHER_BATCH_MAX_LOCATIONS'] = int(os.getenv('WEATHER_BATCH_MAX_LOCATIONS', 100))
+weather_executor = ThreadPoolExecutor(max_workers=int(os.getenv('WEATHER_BATCH_WORKERS', 8)),
+                                      thread_name_prefix='weather')
+
+# Weather cache: entries are fresh for WEATHER_CACHE_TTL seconds, then served
+# stale for up to WEATHER_CACHE_STALE_TTL more while one refresh runs
+app.config['WEATHER_CACHE_TTL'] = int(os.getenv('WEATHER_CACHE_TTL', 600))
+app.config['WEATHER_CACHE_STALE_TTL'] = int(os.getenv('WEATHER_CACHE_STALE_TTL', 3600))
+# Seconds a location the weather API does not know (404) is answered with mock data without asking again
+app.config['WEATHER_NOT_FOUND_TTL'] = int(os.getenv('WEATHER_NOT_FOUND_TTL', 300))
+# Weather alert thresholds, checked against the next 24 hours of forecast
+app.config['ALERT_HEAVY_RAIN_MM'] = float(os.getenv('ALERT_HEAVY_RAIN_MM', 50))
+app.config['ALERT_HEAT_C'] = float(os.getenv('ALERT_HEAT_C', 40))
+app.config['ALERT_COLD_C'] = float(os.getenv('ALERT_COLD_C', 4))
+app.config['ALERT_WIND_KMH'] = float(os.getenv('ALERT_WIND_KMH', 40))
+app.config['MARKET_PRICE_CACHE_TTL'] = int(os.getenv('MARKET_PRICE_CACHE_TTL', 3600))
+
+weather_cache = StaleWhileRevalidateCache(
+    app_cache,
+    ttl=app.config['WEATHER_CACHE_TTL'],
+    stale_ttl=app.config['WEATHER_CACHE_STALE_TTL'],
+    prefix='forecast:'
+)
 
 # Custom template filter for Indian currency format
 @app.template_filter('inr')
@@ -97,6 +319,11 @@ class User(UserMixin, db.Model):
     soil_type = db.Column(db.String(50))
     subscription = db.Column(db.Boolean, default=False)  # Weather alerts subscription
     
+    # Lets the alert pipeline walk subscribers in location order
+    __table_args__ = (
+        db.Index('ix_user_subscription_location', 'subscription', 'farm_location', 'id'),
+    )
+    
     # Relationship with orders
     orders = db.relationship('Order', backref='user_ref', lazy=True)
     # Relationship with forum posts
@@ -112,6 +339,16 @@ class Product(db.Model):
     image = db.Column(db.String(100), nullable=False)
     category = db.Column(db.String(50), nullable=False)
     in_stock = db.Column(db.Boolean, default=True)
+    # Units left to sell; checkout reserves from it. None means stock is not tracked.
+    stock_quantity = db.Column(db.Integer)
+    
+    # Catalog listings filter on in_stock (and category) and sort by price or name
+    __table_args__ = (
+        db.Index('ix_product_in_stock_category_price', 'in_stock', 'category', 'price'),
+        db.Index('ix_product_in_stock_category_name', 'in_stock', 'category', 'name'),
+        db.Index('ix_product_in_stock_price', 'in_stock', 'price'),
+        db.Index('ix_product_in_stock_name', 'in_stock', 'name'),
+    )
     
     # Relationship with orders
     orders = db.relationship('Order', backref='product_ref', lazy=True)
@@ -123,11 +360,42 @@ class Order(db.Model):
     quantity = db.Column(db.Integer, nullable=False, default=1)
     order_date = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='Pending')
+    # Set at checkout: the order this line belongs to and the price paid per unit
+    header_id = db.Column(db.Integer, db.ForeignKey('order_header.id'))
+    unit_price = db.Column(db.Float)
+    
+    __table_args__ = (
+        # Cart, checkout, orders and dashboard all filter by user and status, newest first
+        db.Index('ix_order_user_status_date', 'user_id', 'status', 'order_date'),
+        # One cart row per user and product, so add_to_cart can upsert; placed
+        # orders may repeat a product
+        db.Index('uq_order_user_product_cart', 'user_id', 'product_id', 'status', unique=True,
+                 sqlite_where=db.text("status = 'Cart'"), postgresql_where=db.text("status = 'Cart'")),
+        db.Index('ix_order_header_id', 'header_id'),
+    )
     
     # Relationships
     user = db.relationship('User', foreign_keys=[user_id])
     product = db.relationship('Product', foreign_keys=[product_id])
 
+class OrderHeader(db.Model):
+    """
+    One placed order; its line items are the Order rows pointing at it
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    status = db.Column(db.String(20), nullable=False, default='Placed')
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+    
+    __table_args__ = (
+        # /orders lists a user's orders newest first
+        db.Index('ix_order_header_user_created', 'user_id', 'created_at'),
+    )
+    
+    lines = db.relationship('Order', backref='header', lazy=True, order_by='Order.id')
+
 class ForumPost(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -135,6 +403,19 @@ class ForumPost(db.Model):
     date_posted = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     category = db.Column(db.String(50), default='General')
+    # Kept up to date by add_comment so listings never have to touch comments
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_activity_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Each listing sort is paged by (sort column, id), see paginate_forum()
+    __table_args__ = (
+        db.Index('ix_forum_post_date_posted', 'date_posted', 'id'),
+        db.Index('ix_forum_post_category_date', 'category', 'date_posted', 'id'),
+        db.Index('ix_forum_post_last_activity', 'last_activity_at', 'id'),
+        db.Index('ix_forum_post_category_activity', 'category', 'last_activity_at', 'id'),
+        db.Index('ix_forum_post_comment_count', 'comment_count', 'id'),
+        db.Index('ix_forum_post_category_comments', 'category', 'comment_count', 'id'),
+    )
     
     # Relationship with comments
     comments = db.relationship('ForumComment', backref='post', lazy=True)
@@ -145,6 +426,43 @@ class ForumComment(db.Model):
     date_posted = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('forum_post.id'), nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_forum_comment_post_date', 'post_id', 'date_posted'),
+    )
+
+class WeatherAlert(db.Model):
+    # Outbox: rows are written by the alert pipeline and picked up by the sender
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    location = db.Column(db.String(200), nullable=False)
+    kind = db.Column(db.String(30), nullable=False)  # 'heavy_rain', 'heat', 'cold', 'wind'
+    message = db.Column(db.String(300), nullable=False)
+    alert_date = db.Column(db.Date, nullable=False)  # local date the alert is for
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        # One alert of each kind per user per day, however often the pipeline runs
+        db.UniqueConstraint('user_id', 'kind', 'alert_date', name='uq_weather_alert_user_kind_date'),
+        db.Index('ix_weather_alert_sent_at', 'sent_at'),
+    )
+
+class IdempotencyKey(db.Model):
+    # Response to a mutating API call, replayed when a client retries with the same key
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    method = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(200), nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_key_user_key'),
+        db.Index('ix_idempotency_key_created_at', 'created_at'),
+    )
 from datetime import datetime
 
 
@@ -154,58 +472,168 @@ def utility_processor():
     import datetime
     return {
         'now': datetime.datetime.utcnow,
-        'current_time': lambda fmt='%d %B, %Y': datetime.datetime.utcnow().strftime(fmt)
+        'current_time': lambda fmt='%d %B, %Y': datetime.datetime.utcnow().strftime(fmt),
+        'cart_count': cart_item_count
     }
+
+def cart_item_count():
+    """
+    Number of items in the current user's cart, for the navbar badge
+    """
+    if not current_user.is_authenticated:
+        return 0
+    # Counted once per request; cached pages also use it for their ETag
+    if 'cart_item_count' not in g:
+        g.cart_item_count = db.session.query(func.coalesce(func.sum(Order.quantity), 0)).filter(
+            Order.user_id == current_user.id, Order.status == 'Cart'
+        ).scalar()
+    return g.cart_item_count
+
+def user_cache_key(user_id):
+    return f'user:{user_id}'
+
+def user_cache_data(user):
+    """
+    JSON-safe copy of a user's columns for the user cache; the password hash
+    never leaves the database
+    """
+    data = {}
+    for column in User.__table__.columns:
+        if column.key == 'password':
+            continue
+        value = getattr(user, column.key)
+        data[column.key] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    """
+    Load the signed-in user from the user cache, or from the database on a miss
+    """
+    key = user_cache_key(user_id)
+    data = app_cache.get(key)
+    if data is None:
+        user = User.query.get(int(user_id))
+        if user is not None:
+            app_cache.set(key, user_cache_data(user), ttl=app.config['USER_CACHE_TTL'])
+        return user
+    
+    # Copy rather than convert in place: the memory backend hands out its own dict
+    user = User(**{
+        column.key: datetime.fromisoformat(data[column.key])
+        if isinstance(column.type, db.DateTime) and data.get(column.key) else data.get(column.key)
+        for column in User.__table__.columns if column.key in data
+    })
+    # Attach it as an unmodified row, so views can still change and commit it;
+    # the password is left unloaded and fetched only if something reads it
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
 
-def get_weather_data(location):
+@event.listens_for(db.session, 'after_flush')
+def note_user_changes(session, flush_context):
+    changed = {obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault('changed_users', set()).update(changed)
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_cached_users(session):
+    # Covers profile edits and alert subscriptions, and any other change to a user row
+    for user_id in session.info.pop('changed_users', ()):
+        app_cache.delete(user_cache_key(user_id))
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_user_changes(session):
+    session.info.pop('changed_users', None)
+
+def normalize_location(location):
     """
-    Fetch real weather data from OpenWeatherMap API
+    Normalize a location string so "New Delhi, IN" and "new delhi,in" share a cache entry
+    """
+    parts = (' '.join(part.split()) for part in location.split(','))
+    return ','.join(part for part in parts if part).lower()
+
+def get_weather_grid(location):
+    """
+    Get the cached forecast grid for a location, or None if the API is unavailable
     """
     if not WEATHER_API_KEY or WEATHER_API_KEY == 'your_openweather_api_key_here':
-        # Return mock data if API key is not configured
-        return get_mock_weather_data(location)
+        return None
     
+    key = normalize_location(location)
+    if app_cache.get(f'forecast-missing:{key}'):
+        return None
     try:
-        params = {
-            'q': location,
-            'appid': WEATHER_API_KEY,
-            'units': 'metric'  # Use metric units (Celsius)
-        }
-        
-        response = requests.get(WEATHER_BASE_URL, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Extract relevant weather information
-        weather_info = {
-            'location': location,
-            'temperature': round(data['main']['temp']),
-            'condition': data['weather'][0]['main'],
-            'humidity': data['main']['humidity'],
-            'wind_speed': round(data['wind']['speed'] * 3.6),  # Convert m/s to km/h
-            'rainfall': data.get('rain', {}).get('1h', 0) if 'rain' in data else 0,
-            'icon': get_weather_icon(data['weather'][0]['icon']),
-            'description': data['weather'][0]['description'].title()
-        }
-        
-        return weather_info
-        
-    except requests.exceptions.RequestException as e:
+        return weather_cache.get(key, lambda: fetch_forecast_grid(location))
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            # A misspelt farm location would otherwise go upstream on every page view
+            app_cache.set(f'forecast-missing:{key}', True, ttl=app.config['WEATHER_NOT_FOUND_TTL'])
+        print(f"Weather API error: {e}")
+    except (requests.exceptions.RequestException, WeatherUnavailable) as e:
         print(f"Weather API error: {e}")
-        return get_mock_weather_data(location)
     except (KeyError, IndexError) as e:
         print(f"Weather data parsing error: {e}")
+    return None
+
+def fetch_forecast_grid(location):
+    """
+    Fetch the 5-day / 3-hour forecast from OpenWeatherMap in one request and
+    pack it into parallel arrays, one entry per 3-hour slot. The first slot
+    stands in for the current conditions, so it is a forecast, not a reading.
+    """
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        data = weather_client.forecast(location)
+        outcome = 'ok'
+    except WeatherUnavailable:
+        outcome = 'skipped'
+        raise
+    finally:
+        weather_api_seconds.observe(time.perf_counter() - started, endpoint='forecast', outcome=outcome)
+    slots = data['list']
+    
+    return {
+        'timezone': data['city'].get('timezone', 0),  # UTC offset in seconds
+        'time': [slot['dt'] for slot in slots],
+        'temp': [slot['main']['temp'] for slot in slots],
+        'temp_min': [slot['main']['temp_min'] for slot in slots],
+        'temp_max': [slot['main']['temp_max'] for slot in slots],
+        'humidity': [slot['main']['humidity'] for slot in slots],
+        'wind': [slot['wind']['speed'] for slot in slots],  # m/s
+        'rain': [slot.get('rain', {}).get('3h', 0) for slot in slots],  # mm per slot
+        'condition': [slot['weather'][0]['main'] for slot in slots],
+        'description': [slot['weather'][0]['description'] for slot in slots],
+        'icon': [slot['weather'][0]['icon'] for slot in slots]
+    }
+
+def get_weather_data(location):
+    """
+    Weather for a location over the next 3-hour slot of the cached forecast
+    grid. Rainfall is the total expected in that slot, not a rate per hour.
+    """
+    grid = get_weather_grid(location)
+    if grid is None:
         return get_mock_weather_data(location)
+    
+    return {
+        'location': location,
+        'temperature': round(grid['temp'][0]),
+        'condition': grid['condition'][0],
+        'humidity': grid['humidity'][0],
+        'wind_speed': round(grid['wind'][0] * 3.6),  # Convert m/s to km/h
+        'rainfall': grid['rain'][0],
+        'rainfall_hours': 3,
+        'icon': get_weather_icon(grid['icon'][0]),
+        'description': grid['description'][0].title()
+    }
 
 def get_mock_weather_data(location):
     """
     Return mock weather data when API is not available
     """
     # Simple hash of location to get consistent "random" data
-    location_hash = hash(location) % 4
+    location_hash = stable_hash(location) % 4
     
     conditions = ['Sunny', 'Partly Cloudy', 'Cloudy', 'Light Rain']
     temperatures = [28, 25, 22, 19]
@@ -218,6 +646,7 @@ def get_mock_weather_data(location):
         'humidity': humidities[location_hash],
         'wind_speed': 12,
         'rainfall': 0 if location_hash != 3 else 2,
+        'rainfall_hours': 3,
         'icon': 'sun' if location_hash == 0 else 'cloud-sun' if location_hash == 1 else 'cloud' if location_hash == 2 else 'cloud-rain',
         'description': conditions[location_hash],
         'is_mock': True  # Flag to indicate this is mock data
@@ -249,20 +678,49 @@ def get_weather_icon(icon_code):
     }
     return icon_mapping.get(icon_code, 'cloud')
 
-def get_weather_forecast(location):
+def get_weather_forecast(location, days=3):
     """
-    Generate a simple 3-day forecast based on current weather
+    Get a daily forecast for the next few days from the cached forecast grid
     """
-    current_weather = get_weather_data(location)
+    grid = get_weather_grid(location)
+    if grid is None:
+        return get_mock_weather_forecast(location, days)
+    
+    # Group the 3-hour slots by local calendar day, starting tomorrow
+    offset = grid['timezone']
+    today = (datetime.utcnow() + timedelta(seconds=offset)).date()
+    slots_by_day = {}
+    for i, timestamp in enumerate(grid['time']):
+        local_time = datetime.utcfromtimestamp(timestamp + offset)
+        if local_time.date() > today:
+            slots_by_day.setdefault(local_time.date(), []).append((local_time, i))
     
-    # Simple forecast based on current conditions
     forecast = []
-    conditions = [current_weather['condition']]
-    temperatures = [current_weather['temperature']]
+    for day in sorted(slots_by_day)[:days]:
+        slots = slots_by_day[day]
+        indexes = [i for _, i in slots]
+        # Describe the day by the slot closest to local noon
+        _, midday = min(slots, key=lambda slot: abs(slot[0].hour - 12))
+        forecast.append({
+            'day': day.strftime('%a, %d %b'),
+            'condition': grid['condition'][midday],
+            'high': round(max(grid['temp_max'][i] for i in indexes)),
+            'low': round(min(grid['temp_min'][i] for i in indexes)),
+            'rainfall': round(sum(grid['rain'][i] for i in indexes), 1),
+            'icon': get_weather_icon(grid['icon'][midday].replace('n', 'd'))
+        })
     
-    # Vary conditions and temperatures for the forecast
-    for i in range(1, 4):
-        condition_idx = (hash(location + str(i)) % 4)
+    return forecast
+
+def get_mock_weather_forecast(location, days=3):
+    """
+    Generate a simple forecast from the mock current weather
+    """
+    current_weather = get_mock_weather_data(location)
+    
+    forecast = []
+    for i in range(1, days + 1):
+        condition_idx = stable_hash(location + str(i)) % 4
         temp_variation = [-2, 0, 2, -1][condition_idx]
         
         forecast_conditions = ['Sunny', 'Partly Cloudy', 'Cloudy', 'Light Rain']
@@ -271,11 +729,18 @@ def get_weather_forecast(location):
             'condition': forecast_conditions[condition_idx],
             'high': current_weather['temperature'] + temp_variation + 2,
             'low': current_weather['temperature'] + temp_variation - 3,
+            'rainfall': 2 if condition_idx == 3 else 0,
             'icon': get_weather_icon(['01d', '02d', '03d', '09d'][condition_idx])
         })
     
     return forecast
 
+def stable_hash(value):
+    """
+    Hash that is the same in every worker and across restarts, unlike hash()
+    """
+    return zlib.crc32(value.encode('utf-8'))
+
 def get_crop_calendar(crop_type, region):
     """
     Get planting and harvesting calendar for crops
@@ -306,6 +771,10 @@ def get_market_prices(crop_name):
     """
     Get mock market prices for crops (in real app, this would come from an API)
     """
+    return _cached_market_prices(crop_name.lower())
+
+@memoize(app_cache, 'market:', ttl=app.config['MARKET_PRICE_CACHE_TTL'])
+def _cached_market_prices(crop_name):
     prices = {
         'rice': {'min': 2500, 'max': 3200, 'unit': 'quintal'},
         'wheat': {'min': 2100, 'max': 2600, 'unit': 'quintal'},
@@ -317,7 +786,7 @@ def get_market_prices(crop_name):
         'onion': {'min': 20, 'max': 45, 'unit': 'kg'}
     }
     
-    return prices.get(crop_name.lower(), {'min': 0, 'max': 0, 'unit': 'kg'})
+    return prices.get(crop_name, {'min': 0, 'max': 0, 'unit': 'kg'})
 
 def get_soil_recommendations(soil_type, crops):
     """
@@ -332,6 +801,67 @@ def get_soil_recommendations(soil_type, crops):
     
     return recommendations.get(soil_type.lower(), ['Get soil tested regularly', 'Add organic matter'])
 
+_template_digests = {}
+
+def page_digest(template_name, context, language):
+    """
+    Digest of everything a page's content block depends on: the template
+    source, the context it is rendered with and the reader's language
+    """
+    source_digest = _template_digests.get(template_name)
+    if source_digest is None or app.jinja_env.auto_reload:
+        source = app.jinja_env.loader.get_source(app.jinja_env, template_name)[0]
+        source_digest = _template_digests[template_name] = hashlib.sha1(source.encode('utf-8')).hexdigest()
+    data = json.dumps([source_digest, language, context], sort_keys=True, default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+def render_cached_page(template_name, **context):
+    """
+    Render a page whose content block depends only on `context`. The block is
+    cached under page_digest(), and only base.html (navbar, flashed messages)
+    is rendered per request. Responses carry an ETag and Last-Modified, and a
+    client whose copy is still current gets 304 Not Modified.
+    """
+    if current_user.is_authenticated:
+        language = current_user.language or 'en'
+        viewer = f'{current_user.id}:{current_user.username}:{cart_item_count()}'
+    else:
+        language = request.accept_languages.best_match(['en', 'hi'], 'en')
+        viewer = 'anonymous'
+    digest = page_digest(template_name, context, language)
+    # The navbar is part of the response too, so the ETag covers who is viewing
+    etag = hashlib.sha1(f'{digest}:{viewer}'.encode('utf-8')).hexdigest()
+    # Flashed messages are shown once, so such a response must never be revalidated
+    cacheable = '_flashes' not in session
+    
+    if cacheable and request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    
+    key = f'page:{template_name}:{digest}'
+    page = app_cache.get(key)
+    if page is None:
+        template = app.jinja_env.get_template(template_name)
+        app.update_template_context(context)
+        body = ''.join(template.blocks['content'](template.new_context(context)))
+        page = {'body': body, 'rendered_at': int(time.time())}
+        app_cache.set(key, page, ttl=app.config['PAGE_CACHE_TTL'])
+    
+    response = app.make_response(render_template('cached_page.html', page_content=Markup(page['body'])))
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    if cacheable:
+        response.set_etag(etag)
+        response.last_modified = page['rendered_at']
+        # Last-Modified says nothing about the signed-in navbar, so only
+        # anonymous pages may be revalidated by date alone
+        if not current_user.is_authenticated:
+            response.make_conditional(request)
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -360,7 +890,7 @@ def register():
             flash('Email already exists!', 'danger')
             return redirect(url_for('register'))
         
-        hashed_password = generate_password_hash(password, method='sha256')
+        hashed_password = hash_password(password, app.config['PASSWORD_HASH_METHOD'])
         new_user = User(username=username, email=email, password=hashed_password)
         db.session.add(new_user)
         db.session.commit()
@@ -380,14 +910,25 @@ def login():
             flash('Please enter both username and password', 'danger')
             return redirect(url_for('login'))
         
+        # Refused before any hashing, so guessing costs no CPU once over the limit
+        if login_throttle.blocked(request.remote_addr, username):
+            flash('Too many failed sign-in attempts. Please try again later.', 'danger')
+            return render_template('login.html'), 429
+        
         user = User.query.filter_by(username=username).first()
         
-        if user and check_password_hash(user.password, password):
+        if user and verify_password(user.password, password):
+            login_throttle.record_success(request.remote_addr, username)
+            if needs_rehash(user.password, app.config['PASSWORD_HASH_METHOD']):
+                # The only moment the plain password is at hand to upgrade the hash
+                user.password = hash_password(password, app.config['PASSWORD_HASH_METHOD'])
+                db.session.commit()
             login_user(user)
             next_page = request.args.get('next')
             flash('Logged in successfully!', 'success')
             return redirect(next_page) if next_page else redirect(url_for('dashboard'))
         else:
+            login_throttle.record_failure(request.remote_addr, username)
             flash('Login failed. Check your username and password.', 'danger')
     
     return render_template('login.html')
@@ -395,15 +936,17 @@ def login():
 @app.route('/logout')
 @login_required
 def logout():
+    app_cache.delete(user_cache_key(current_user.id))
     logout_user()
     flash('You have been logged out.', 'info')
     return redirect(url_for('index'))
 
 @app.route('/dashboard')
 @login_required
+@replica_reads
 def dashboard():
     # Get user's recent orders
-    recent_orders = Order.query.filter_by(
+    recent_orders = Order.query.options(joinedload(Order.product)).filter_by(
         user_id=current_user.id, 
         status='Ordered'
     ).order_by(Order.order_date.desc()).limit(3).all()
@@ -414,7 +957,8 @@ def dashboard():
         weather_data = get_weather_data(current_user.farm_location)
     
     # Get recent forum posts
-    recent_posts = ForumPost.query.order_by(ForumPost.date_posted.desc()).limit(5).all()
+    recent_posts = ForumPost.query.options(joinedload(ForumPost.author)).order_by(
+        ForumPost.date_posted.desc()).limit(5).all()
     
     return render_template('dashboard.html', user=current_user, 
                           recent_orders=recent_orders, weather=weather_data,
@@ -431,7 +975,7 @@ def weather():
     elif not location:
         location = "New Delhi,IN"  # Default location
     
-    # Get current weather
+    # Get the next 3-hour forecast slot, shown as the current weather
     weather_data = get_weather_data(location)
     
     # Get forecast
@@ -484,7 +1028,7 @@ def diseases():
         if filtered_alerts:
             alerts = filtered_alerts
     
-    return render_template('diseases.html', alerts=alerts)
+    return render_cached_page('diseases.html', alerts=alerts)
 
 @app.route('/crop_calendar')
 @login_required
@@ -495,11 +1039,12 @@ def crop_calendar():
     if crop_type:
         calendar_data = get_crop_calendar(crop_type, current_user.farm_location or 'India')
     
-    return render_template('crop_calendar.html', crop_type=crop_type, 
-                          calendar_data=calendar_data, crops=INDIAN_CROPS)
+    return render_cached_page('crop_calendar.html', crop_type=crop_type, 
+                              calendar_data=calendar_data, crops=INDIAN_CROPS)
 
 @app.route('/market_prices')
 @login_required
+@replica_reads
 def market_prices():
     crop_name = request.args.get('crop', '')
     price_data = {}
@@ -510,18 +1055,19 @@ def market_prices():
     # Get all available crops for the dropdown
     available_crops = ['rice', 'wheat', 'sugarcane', 'cotton', 'maize', 'tomato', 'potato', 'onion']
     
-    return render_template('market_prices.html', crop_name=crop_name, 
-                          price_data=price_data, crops=available_crops)
+    return render_cached_page('market_prices.html', crop_name=crop_name, 
+                              price_data=price_data, crops=available_crops,
+                              price_date=datetime.utcnow().strftime('%d %B, %Y'))
 
 @app.route('/government_schemes')
 @login_required
 def government_schemes():
-    return render_template('government_schemes.html', schemes=GOVERNMENT_SCHEMES)
+    return render_cached_page('government_schemes.html', schemes=GOVERNMENT_SCHEMES)
 
 @app.route('/expert_advice')
 @login_required
 def expert_advice():
-    return render_template('expert_advice.html')
+    return render_cached_page('expert_advice.html')
 
 @app.route("/soil-testing")
 def soil_testing():
@@ -530,11 +1076,11 @@ def soil_testing():
         "Improve irrigation",
         "Do regular pH testing"
     ]
-    return render_template(
+    return render_cached_page(
         "soil_testing.html",
-        user=current_user,   # if you use Flask-Login
+        soil_type=current_user.soil_type if current_user.is_authenticated else None,
         recommendations=recommendations,
-        now=datetime.now()   # pass current datetime
+        now=datetime.now().date()   # pass current date
     )
 
 @app.route('/loan_calculator', methods=['GET', 'POST'])
@@ -573,24 +1119,157 @@ def loan_calculator():
                          total_interest=total_interest,
                          total_amount=total_amount)
 
+# Sort orders offered on the forum listing
+FORUM_SORTS = {
+    'newest': ForumPost.date_posted,
+    'active': ForumPost.last_activity_at,  # most recently commented on
+    'popular': ForumPost.comment_count,  # most replies
+}
+
+def encode_cursor(post, sort):
+    """
+    Opaque cursor for a post's position in a forum listing
+    """
+    value = getattr(post, FORUM_SORTS[sort].key)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, post.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, sort):
+    """
+    Turn a cursor back into (sort value, post id), or None if it is not valid
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, post_id = json.loads(raw)
+        if sort != 'popular':
+            value = datetime.fromisoformat(value)
+        elif type(value) is not int:
+            # e.g. a date cursor reused with sort=popular; start again from the first page
+            return None
+        return value, int(post_id)
+    except (ValueError, TypeError):
+        return None
+
+def paginate_forum(query, sort, after=None, before=None, per_page=10):
+    """
+    Keyset pagination over (sort column, id), newest first. `after` continues
+    to older posts and `before` goes back to newer ones, so every page is one
+    index range scan however deep it is. Returns (posts, prev_cursor, next_cursor).
+    """
+    column = FORUM_SORTS[sort]
+    key = tuple_(column, ForumPost.id)
+    after = decode_cursor(after, sort) if after else None
+    before = decode_cursor(before, sort) if before and not after else None
+    
+    if before:
+        rows = query.filter(key > before).order_by(column.asc(), ForumPost.id.asc()).limit(per_page + 1).all()
+        has_newer = len(rows) > per_page
+        posts = rows[:per_page][::-1]
+        has_older = True
+    else:
+        if after:
+            query = query.filter(key < after)
+        rows = query.order_by(column.desc(), ForumPost.id.desc()).limit(per_page + 1).all()
+        posts = rows[:per_page]
+        has_newer = after is not None
+        has_older = len(rows) > per_page
+    
+    prev_cursor = encode_cursor(posts[0], sort) if posts and has_newer else None
+    next_cursor = encode_cursor(posts[-1], sort) if posts and has_older else None
+    return posts, prev_cursor, next_cursor
+
+def approximate_forum_total(category):
+    """
+    Number of posts in a category, counted at most once per FORUM_COUNT_CACHE_TTL
+    """
+    key = f'forum-total:{category}'
+    total = app_cache.get(key)
+    if total is None:
+        query = ForumPost.query
+        if category != 'all':
+            query = query.filter_by(category=category)
+        total = query.count()
+        app_cache.set(key, total, ttl=app.config['FORUM_COUNT_CACHE_TTL'])
+    return total
+
+def forum_listing_args():
+    """
+    Read category, sort and cursor arguments shared by /forum and /api/forum
+    """
+    category = request.args.get('category', 'all')
+    sort = request.args.get('sort', 'newest')
+    if sort not in FORUM_SORTS:
+        sort = 'newest'
+    
+    query = ForumPost.query.options(joinedload(ForumPost.author))
+    if category != 'all':
+        query = query.filter_by(category=category)
+    return category, sort, query
+
 @app.route('/forum')
 @login_required
+@replica_reads
 def forum():
-    category = request.args.get('category', 'all')
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
+    category, sort, query = forum_listing_args()
+    posts, prev_cursor, next_cursor = paginate_forum(
+        query, sort, after=request.args.get('after'), before=request.args.get('before'))
     
-    if category == 'all':
-        posts = ForumPost.query.order_by(ForumPost.date_posted.desc()).paginate(page=page, per_page=per_page)
-    else:
-        posts = ForumPost.query.filter_by(category=category).order_by(ForumPost.date_posted.desc()).paginate(page=page, per_page=per_page)
+    return render_template('forum.html', posts=posts, category=category, sort=sort,
+                           prev_cursor=prev_cursor, next_cursor=next_cursor,
+                           approx_total=approximate_forum_total(category))
+
+@app.route('/api/forum')
+@login_required
+@replica_reads
+def api_forum():
+    category, sort, query = forum_listing_args()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    posts, prev_cursor, next_cursor = paginate_forum(
+        query, sort, after=request.args.get('after'), before=request.args.get('before'),
+        per_page=limit)
+    
+    return jsonify({
+        'posts': [{
+            'id': post.id,
+            'title': post.title,
+            'excerpt': post.content[:200],
+            'category': post.category,
+            'author': post.author.username,
+            'date_posted': post.date_posted.isoformat(),
+            'last_activity_at': post.last_activity_at.isoformat() if post.last_activity_at else None,
+            'comment_count': post.comment_count,
+            'url': url_for('forum_post', post_id=post.id)
+        } for post in posts],
+        'prev_cursor': prev_cursor,
+        'next_cursor': next_cursor,
+        'approx_total': approximate_forum_total(category)
+    })
+
+@app.route('/forum/search')
+@login_required
+@replica_reads
+def forum_search():
+    q = request.args.get('q', '').strip()[:200]
+    results = search_forum(db.session.connection(), q) if q else []
+    
+    # One query for the matching posts, then put them back in rank order
+    posts = ForumPost.query.options(joinedload(ForumPost.author)).filter(
+        ForumPost.id.in_([post_id for post_id, _ in results])).all() if results else []
+    posts_by_id = {post.id: post for post in posts}
+    matches = [(posts_by_id[post_id], snippet) for post_id, snippet in results if post_id in posts_by_id]
     
-    return render_template('forum.html', posts=posts, category=category)
+    return render_template('forum_search.html', q=q, matches=matches)
 
 @app.route('/forum/post/<int:post_id>')
 @login_required
+@replica_reads
 def forum_post(post_id):
-    post = ForumPost.query.get_or_404(post_id)
+    post = ForumPost.query.options(
+        joinedload(ForumPost.author),
+        selectinload(ForumPost.comments).joinedload(ForumComment.author)
+    ).get_or_404(post_id)
     return render_template('forum_post.html', post=post)
 
 @app.route('/forum/create', methods=['GET', 'POST'])
@@ -624,27 +1303,113 @@ def add_comment(post_id):
         flash('Comment cannot be empty!', 'danger')
         return redirect(url_for('forum_post', post_id=post_id))
     
-    comment = ForumComment(content=content, user_id=current_user.id, post_id=post_id)
+    comment = ForumComment(content=content, user_id=current_user.id, post_id=post_id,
+                           date_posted=datetime.utcnow())
     db.session.add(comment)
+    # Increment in SQL so concurrent comments cannot overwrite each other's count
+    ForumPost.query.filter_by(id=post_id).update({
+        ForumPost.comment_count: ForumPost.comment_count + 1,
+        ForumPost.last_activity_at: comment.date_posted
+    }, synchronize_session=False)
     db.session.commit()
     
     flash('Your comment has been added!', 'success')
     return redirect(url_for('forum_post', post_id=post_id))
 
+# Sort options for the catalog; id breaks ties so pages never overlap
+CATALOG_SORTS = {
+    'name': (Product.name.asc(), Product.id.asc()),
+    'price_low': (Product.price.asc(), Product.id.asc()),
+    'price_high': (Product.price.desc(), Product.id.desc()),
+    'newest': (Product.id.desc(),),
+}
+CATALOG_FACETS_KEY = 'catalog:facets'
+
+def catalog_facets():
+    """
+    In-stock product count per category as [category, count] pairs, cached
+    until a product changes
+    """
+    facets = app_cache.get(CATALOG_FACETS_KEY)
+    if facets is None:
+        rows = db.session.query(Product.category, func.count(Product.id)).filter_by(
+            in_stock=True).group_by(Product.category).order_by(Product.category).all()
+        facets = [[category, count] for category, count in rows]
+        app_cache.set(CATALOG_FACETS_KEY, facets, ttl=app.config['CATALOG_FACET_CACHE_TTL'])
+    return facets
+
+@event.listens_for(db.session, 'after_flush')
+def note_catalog_changes(session, flush_context):
+    if any(isinstance(obj, Product) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['catalog_changed'] = True
+
+@event.listens_for(db.session, 'do_orm_execute')
+def note_catalog_bulk_changes(orm_execute_state):
+    # Query.update()/delete() on products skip the flush
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and \
+            orm_execute_state.bind_mapper is Product.__mapper__:
+        orm_execute_state.session.info['catalog_changed'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_catalog_facets(session):
+    if session.info.pop('catalog_changed', False):
+        app_cache.delete(CATALOG_FACETS_KEY)
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_catalog_changes(session):
+    session.info.pop('catalog_changed', None)
+
+def search_catalog(q='', category='all', min_price=None, max_price=None, sort='name', page=1, per_page=24):
+    """
+    One page of in-stock products matching the filters, sorted by `sort`
+    ('relevance' needs `q`). A `q` with no searchable words, such as "!!!",
+    does not filter. Returns (products, has_next).
+    """
+    query = Product.query.filter_by(in_stock=True)
+    if category != 'all':
+        query = query.filter_by(category=category)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    
+    order = CATALOG_SORTS.get(sort, CATALOG_SORTS['name'])
+    matches = product_matches(db.engine.dialect.name, q) if q else None
+    if matches is not None:
+        if sort == 'relevance':
+            query = query.join(matches, matches.c.product_id == Product.id)
+            order = (matches.c.rank, Product.id)
+        else:
+            # As a join SQLite would re-run the match for every product in
+            # sort order; IN builds the set of matching ids once
+            query = query.filter(Product.id.in_(db.select(matches.c.product_id)))
+    
+    # One row past the page tells whether there is a next page without a COUNT
+    rows = query.order_by(*order).offset((page - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
+
 @app.route('/shop')
 @login_required
+@replica_reads
 def shop():
     category = request.args.get('category', 'all')
+    q = request.args.get('q', '').strip()[:100]
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
+    sort = request.args.get('sort', 'relevance' if q else 'name')
+    if sort not in CATALOG_SORTS and not (sort == 'relevance' and q):
+        sort = 'name'
+    page = max(request.args.get('page', 1, type=int), 1)
     
-    if category == 'all':
-        products = Product.query.filter_by(in_stock=True).all()
-    else:
-        products = Product.query.filter_by(category=category, in_stock=True).all()
-    
-    categories = db.session.query(Product.category).distinct().all()
-    categories = [cat[0] for cat in categories]
+    products, has_next = search_catalog(q, category, min_price, max_price, sort, page,
+                                        per_page=app.config['SHOP_PAGE_SIZE'])
+    facets = catalog_facets()
     
-    return render_template('shop.html', products=products, categories=categories, current_category=category)
+    return render_template('shop.html', products=products, facets=facets,
+                           categories=[name for name, _ in facets], current_category=category,
+                           q=q, min_price=min_price, max_price=max_price, sort=sort,
+                           page=page, has_next=has_next,
+                           total_in_stock=sum(count for _, count in facets))
 
 @app.route('/add_to_cart/<int:product_id>')
 @login_required
@@ -655,90 +1420,295 @@ def add_to_cart(product_id):
         flash('This product is out of stock!', 'danger')
         return redirect(url_for('shop'))
     
-    # Check if product is already in user's cart
-    existing_order = Order.query.filter_by(
-        user_id=current_user.id, 
-        product_id=product_id, 
-        status='Cart'
-    ).first()
+    quantity = add_cart_item(current_user.id, product_id)
+    db.session.commit()
     
-    if existing_order:
-        existing_order.quantity += 1
+    if quantity > 1:
         flash(f'Added another {product.name} to cart!', 'success')
     else:
-        new_order = Order(
-            user_id=current_user.id,
-            product_id=product_id,
-            quantity=1,
-            status='Cart'
-        )
-        db.session.add(new_order)
         flash(f'{product.name} added to cart!', 'success')
-    
-    db.session.commit()
     return redirect(url_for('shop'))
 
+def add_cart_item(user_id, product_id, quantity=1):
+    """
+    Add to a cart row in one atomic upsert, so concurrent taps can neither
+    create a second row nor lose an increment. Returns the new quantity.
+    """
+    orders = Order.__table__
+    statement = dialect_insert(orders).values(
+        user_id=user_id, product_id=product_id, quantity=quantity, status='Cart',
+        order_date=datetime.utcnow()
+    ).on_conflict_do_update(
+        index_elements=['user_id', 'product_id', 'status'],
+        index_where=orders.c.status == 'Cart',
+        set_={'quantity': orders.c.quantity + quantity}
+    ).returning(orders.c.quantity)
+    return db.session.execute(statement).scalar_one()
+
+# Flat shipping charge and tax rate added to every non-empty cart
+CART_SHIPPING = 5
+CART_TAX_RATE = 0.08
+
+def cart_lines(user_id):
+    """
+    The user's cart rows with their products, plus the item count and
+    subtotal summed in SQL by the same query. Returns (items, item_count, subtotal).
+    """
+    rows = db.session.query(
+        Order,
+        func.sum(Order.quantity).over(),
+        func.sum(Product.price * Order.quantity).over()
+    ).join(Order.product).options(contains_eager(Order.product)).filter(
+        Order.user_id == user_id, Order.status == 'Cart'
+    ).order_by(Order.id).all()
+    if not rows:
+        return [], 0, 0
+    return [row[0] for row in rows], rows[0][1], rows[0][2]
+
+def cart_charges(subtotal):
+    """
+    Subtotal, shipping, tax and total for a cart subtotal
+    """
+    shipping = CART_SHIPPING if subtotal else 0
+    tax = round(subtotal * CART_TAX_RATE, 2)
+    return {'subtotal': subtotal, 'shipping': shipping, 'tax': tax,
+            'total': round(subtotal + shipping + tax, 2)}
+
+def cart_payload(user_id):
+    """
+    JSON-ready cart returned by every cart API call
+    """
+    items, item_count, subtotal = cart_lines(user_id)
+    return {
+        'items': [{
+            'id': item.id,
+            'product_id': item.product_id,
+            'name': item.product.name,
+            'price': item.product.price,
+            'quantity': item.quantity,
+            'line_total': item.product.price * item.quantity
+        } for item in items],
+        'item_count': item_count,
+        **cart_charges(subtotal)
+    }
+
 @app.route('/cart')
 @login_required
+@replica_reads
 def cart():
-    cart_items = Order.query.filter_by(user_id=current_user.id, status='Cart').all()
-    total = sum(item.product.price * item.quantity for item in cart_items) if cart_items else 0
-    return render_template('cart.html', cart_items=cart_items, total=total)
+    cart_items, item_count, subtotal = cart_lines(current_user.id)
+    return render_template('cart.html', cart_items=cart_items, charges=cart_charges(subtotal))
 
 @app.route('/update_cart/<int:order_id>/<action>')
 @login_required
 def update_cart(order_id, action):
-    order = Order.query.get_or_404(order_id)
-    
-    # Verify the order belongs to the current user
-    if order.user_id != current_user.id or order.status != 'Cart':
-        flash('You cannot modify this cart item.', 'danger')
-        return redirect(url_for('cart'))
+    # Each change is a single conditional statement on the user's own cart
+    # row, so double taps cannot lose an update or go below one
+    item = Order.query.filter_by(id=order_id, user_id=current_user.id, status='Cart')
     
     if action == 'increase':
-        order.quantity += 1
-        db.session.commit()
-        flash('Cart updated!', 'success')
+        updated = item.update({Order.quantity: Order.quantity + 1}, synchronize_session=False)
+        message = ('Cart updated!', 'success')
     elif action == 'decrease':
-        if order.quantity > 1:
-            order.quantity -= 1
-            db.session.commit()
-            flash('Cart updated!', 'success')
-        else:
-            db.session.delete(order)
-            db.session.commit()
-            flash('Item removed from cart.', 'info')
+        updated = item.filter(Order.quantity > 1).update(
+            {Order.quantity: Order.quantity - 1}, synchronize_session=False)
+        message = ('Cart updated!', 'success')
+        if not updated:
+            updated = item.delete(synchronize_session=False)
+            message = ('Item removed from cart.', 'info')
     elif action == 'remove':
-        db.session.delete(order)
-        db.session.commit()
-        flash('Item removed from cart.', 'info')
+        updated = item.delete(synchronize_session=False)
+        message = ('Item removed from cart.', 'info')
+    else:
+        return redirect(url_for('cart'))
     
+    db.session.commit()
+    if updated:
+        flash(*message)
+    else:
+        flash('You cannot modify this cart item.', 'danger')
     return redirect(url_for('cart'))
 
+def idempotent(view):
+    """
+    Make a mutating JSON API view safe to retry. The view returns
+    (payload, status) and does not commit. With an Idempotency-Key header a
+    2xx response is stored in the same transaction as the change, and a retry
+    with that key gets the stored response back instead of running again.
+    Errors are not stored, so a corrected retry with the same key still runs.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            payload, status = view(*args, **kwargs)
+            db.session.commit()
+            return jsonify(payload), status
+        if not 0 < len(key) <= 64:
+            return jsonify({'error': 'Idempotency-Key must be 1 to 64 characters'}), 400
+        
+        user_id = current_user.id
+        stored = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+        if stored is None:
+            payload, status = view(*args, **kwargs)
+            if not 200 <= status < 300:
+                db.session.commit()
+                return jsonify(payload), status
+            now = datetime.utcnow()
+            claimed = db.session.execute(dialect_insert(IdempotencyKey.__table__).values(
+                user_id=user_id, key=key, method=request.method, path=request.path,
+                status_code=status, response=json.dumps(payload), created_at=now
+            ).on_conflict_do_nothing()).rowcount
+            if claimed:
+                expired = now - timedelta(seconds=app.config['IDEMPOTENCY_KEY_TTL'])
+                IdempotencyKey.query.filter(IdempotencyKey.created_at < expired).delete(synchronize_session=False)
+                db.session.commit()
+                return jsonify(payload), status
+            # A concurrent retry with this key committed first: undo ours and replay its response
+            db.session.rollback()
+            stored = IdempotencyKey.query.filter_by(user_id=user_id, key=key).one()
+        
+        if (stored.method, stored.path) != (request.method, request.path):
+            return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+        response = app.response_class(stored.response, status=stored.status_code, mimetype='application/json')
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    return wrapper
+
+@app.route('/api/cart')
+@login_required
+@replica_reads
+def api_cart():
+    return jsonify(cart_payload(current_user.id))
+
+@app.route('/api/cart/items', methods=['POST'])
+@login_required
+@idempotent
+def api_add_cart_item():
+    # Only JSON bodies are accepted, so other sites cannot post a form here
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return {'error': 'Expected a JSON body'}, 400
+    product_id, quantity = data.get('product_id'), data.get('quantity', 1)
+    if not isinstance(product_id, int) or not isinstance(quantity, int) or quantity < 1:
+        return {'error': 'product_id and a positive integer quantity are required'}, 400
+    
+    product = db.session.get(Product, product_id)
+    if product is None:
+        return {'error': 'No such product'}, 404
+    if not product.in_stock:
+        return {'error': f'{product.name} is out of stock'}, 409
+    
+    add_cart_item(current_user.id, product_id, quantity)
+    return cart_payload(current_user.id), 200
+
+@app.route('/api/cart/items/<int:order_id>', methods=['PATCH'])
+@login_required
+@idempotent
+def api_update_cart_item(order_id):
+    data = request.get_json(silent=True)
+    quantity = data.get('quantity') if isinstance(data, dict) else None
+    if not isinstance(quantity, int) or quantity < 0:
+        return {'error': 'quantity must be a non-negative integer'}, 400
+    
+    item = Order.query.filter_by(id=order_id, user_id=current_user.id, status='Cart')
+    if quantity == 0:
+        updated = item.delete(synchronize_session=False)
+    else:
+        updated = item.update({Order.quantity: quantity}, synchronize_session=False)
+    if not updated:
+        return {'error': 'No such cart item'}, 404
+    return cart_payload(current_user.id), 200
+
+@app.route('/api/cart/items/<int:order_id>', methods=['DELETE'])
+@login_required
+@idempotent
+def api_remove_cart_item(order_id):
+    removed = Order.query.filter_by(id=order_id, user_id=current_user.id, status='Cart').delete(
+        synchronize_session=False)
+    if not removed:
+        return {'error': 'No such cart item'}, 404
+    return cart_payload(current_user.id), 200
+
+class CheckoutError(Exception):
+    """Raised when a cart cannot be turned into an order."""
+
+class EmptyCartError(CheckoutError):
+    """Raised when there is nothing in the cart to order."""
+
+def place_order(user_id):
+    """
+    Turn the user's cart into an OrderHeader inside the current transaction.
+    Every step is one set-based statement, so the cost does not grow with the
+    number of cart lines. Rolls back and raises CheckoutError if the cart is
+    empty or any product is short of stock.
+    """
+    now = datetime.utcnow()
+    header = OrderHeader(user_id=user_id, created_at=now)
+    db.session.add(header)
+    db.session.flush()
+    
+    # Moving the lines first fixes what is in this order: an add_to_cart that
+    # races with checkout starts a new cart row instead of joining it
+    price = db.select(Product.price).where(Product.id == Order.product_id).scalar_subquery()
+    moved = Order.query.filter_by(user_id=user_id, status='Cart').update({
+        Order.status: 'Ordered',
+        Order.order_date: now,
+        Order.header_id: header.id,
+        Order.unit_price: price
+    }, synchronize_session=False)
+    if not moved:
+        db.session.rollback()
+        raise EmptyCartError('Your cart is empty!')
+    
+    summary = db.session.query(
+        func.sum(Order.quantity),
+        func.sum(Order.quantity * Order.unit_price),
+        func.count(Product.stock_quantity),
+        func.sum(db.case((Product.in_stock, 0), else_=1))
+    ).join(Product, Product.id == Order.product_id).filter(Order.header_id == header.id).one()
+    item_count, total, tracked, unavailable = summary
+    
+    # Reserve stock for every tracked product in one UPDATE; a product that
+    # is short does not match, so fewer rows than tracked lines means failure
+    ordered = db.select(Order.quantity).where(
+        Order.header_id == header.id, Order.product_id == Product.id).scalar_subquery()
+    reserved = Product.query.filter(Product.stock_quantity >= ordered).update({
+        Product.stock_quantity: Product.stock_quantity - ordered,
+        Product.in_stock: Product.stock_quantity - ordered > 0
+    }, synchronize_session=False)
+    if unavailable or reserved != tracked:
+        db.session.rollback()
+        raise CheckoutError('Some items in your cart are out of stock. Please update your cart.')
+    
+    header.item_count = item_count
+    header.total = total
+    return header
+
 @app.route('/checkout')
 @login_required
 def checkout():
-    cart_items = Order.query.filter_by(user_id=current_user.id, status='Cart').all()
-    
-    if not cart_items:
-        flash('Your cart is empty!', 'warning')
+    try:
+        header = place_order(current_user.id)
+    except EmptyCartError as e:
+        flash(str(e), 'warning')
         return redirect(url_for('shop'))
+    except CheckoutError as e:
+        flash(str(e), 'warning')
+        return redirect(url_for('cart'))
     
-    for item in cart_items:
-        item.status = 'Ordered'
-        item.order_date = datetime.utcnow()
-    
+    order_id = header.id
     db.session.commit()
-    flash('Order placed successfully!', 'success')
+    flash(f'Order #{order_id} placed successfully!', 'success')
     return redirect(url_for('orders'))
 
 @app.route('/orders')
 @login_required
+@replica_reads
 def orders():
-    user_orders = Order.query.filter(
-        Order.user_id == current_user.id, 
-        Order.status != 'Cart'
-    ).order_by(Order.order_date.desc()).all()
+    user_orders = OrderHeader.query.options(
+        joinedload(OrderHeader.lines).joinedload(Order.product)
+    ).filter_by(user_id=current_user.id).order_by(OrderHeader.created_at.desc()).all()
     return render_template('orders.html', orders=user_orders)
 
 @app.route('/profile', methods=['GET', 'POST'])
@@ -757,14 +1727,213 @@ def profile():
     
     return render_template('profile.html', user=current_user)
 
+@app.route('/metrics')
+def metrics():
+    """
+    Request, SQL, weather API and template timings of all workers, in the
+    Prometheus text format
+    """
+    return app.response_class(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/weather/<location>')
 def api_weather(location):
     weather_data = get_weather_data(location)
     return jsonify(weather_data)
 
+@app.route('/api/weather')
+def api_weather_batch():
+    """
+    Weather for many locations in one response, e.g.
+    /api/weather?locations=Nashik,IN;Pune,IN or repeated ?locations= params
+    """
+    # Locations contain commas ("Pune,IN"), so ';' separates them
+    locations = {}
+    for value in request.args.getlist('locations'):
+        for location in value.split(';'):
+            location = location.strip()
+            if location:
+                locations.setdefault(normalize_location(location), location)
+    
+    if not locations:
+        return jsonify({'error': 'No locations given'}), 400
+    if len(locations) > app.config['WEATHER_BATCH_MAX_LOCATIONS']:
+        return jsonify({'error': f"At most {app.config['WEATHER_BATCH_MAX_LOCATIONS']} locations per request"}), 400
+    
+    requested = list(locations.values())
+    results = weather_executor.map(get_weather_data, requested)
+    return jsonify({'count': len(requested), 'weather': dict(zip(requested, results))})
+
+def dialect_insert(table):
+    """
+    INSERT construct for the active database, so callers can use ON CONFLICT clauses
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+@app.cli.command('send-weather-alerts')
+@click.option('--batch-size', default=1000, show_default=True, help='Subscribers read per query.')
+@click.option('--concurrency', default=8, show_default=True, help='Parallel weather lookups.')
+@click.option('--every', default=0, help='Repeat every N seconds instead of running once.')
+def send_weather_alerts_command(batch_size, concurrency, every):
+    """Queue weather alerts for subscribed users in the outbox table."""
+    from alerts import run_alert_pipeline
+    
+    while True:
+        stats = run_alert_pipeline(batch_size=batch_size, concurrency=concurrency)
+        click.echo(f"Checked {stats['locations']} locations for {stats['users']} subscribers, "
+                   f"queued {stats['alerts']} alerts in {stats['seconds']:.1f}s")
+        if not every:
+            break
+        time.sleep(every)
+
+def hot_queries():
+    """
+    The queries behind the busiest pages, with sample arguments
+    """
+    return {
+        'dashboard orders': Order.query.filter_by(user_id=1, status='Ordered').order_by(Order.order_date.desc()).limit(3),
+        'cart': Order.query.filter_by(user_id=1, status='Cart'),
+        'orders': OrderHeader.query.filter_by(user_id=1).order_by(OrderHeader.created_at.desc()),
+        'order lines': Order.query.filter(Order.header_id.in_([1, 2, 3])),
+        'forum': ForumPost.query.order_by(ForumPost.date_posted.desc()).limit(10),
+        'forum next page': ForumPost.query.filter(tuple_(ForumPost.date_posted, ForumPost.id) < (datetime(2024, 1, 1), 100)).order_by(ForumPost.date_posted.desc(), ForumPost.id.desc()).limit(11),
+        'forum category': ForumPost.query.filter_by(category='crops').order_by(ForumPost.date_posted.desc()).limit(10),
+        'forum active': ForumPost.query.order_by(ForumPost.last_activity_at.desc()).limit(10),
+        'forum category popular': ForumPost.query.filter_by(category='crops').order_by(ForumPost.comment_count.desc()).limit(10),
+        'forum post comments': ForumComment.query.filter_by(post_id=1).order_by(ForumComment.date_posted),
+        'shop': Product.query.filter_by(in_stock=True).order_by(Product.name, Product.id).limit(25),
+        'shop category': Product.query.filter_by(category='Organic', in_stock=True).order_by(Product.name, Product.id).limit(25),
+        'shop price range': Product.query.filter_by(in_stock=True).filter(Product.price.between(100, 500)).order_by(Product.price, Product.id).limit(25),
+        'shop facets': db.session.query(Product.category, func.count(Product.id)).filter_by(in_stock=True).group_by(Product.category),
+    }
+
+def query_plan(query):
+    """
+    The steps of SQLite's EXPLAIN QUERY PLAN for a query
+    """
+    sql = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    return [row[-1] for row in db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+
+def is_full_scan(plan):
+    # "SCAN t USING INDEX ..." walks an index in order; a bare "SCAN t" reads the whole table
+    return any(step.startswith('SCAN') and 'INDEX' not in step for step in plan)
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Show EXPLAIN QUERY PLAN for the hot queries and fail on full table scans."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('check-query-plans reads SQLite query plans only')
+    
+    full_scans = []
+    for name, query in hot_queries().items():
+        plan = query_plan(query)
+        click.echo(name)
+        for step in plan:
+            click.echo(f'    {step}')
+        if is_full_scan(plan):
+            full_scans.append(name)
+    
+    if full_scans:
+        raise click.ClickException(f"Full table scan in: {', '.join(full_scans)}")
+    click.echo('All hot queries use indexes.')
+
+# Most SQL statements each page may run: the user lookup (when the user cache
+# misses), the navbar cart badge and the view's own queries
+PAGE_QUERY_BUDGETS = {
+    '/dashboard': 4,
+    '/forum': 4,
+    '/cart': 3,
+    '/orders': 3,
+    '/shop': 4,
+}
+
+@app.cli.command('check-query-counts')
+@click.argument('username')
+def check_query_counts_command(username):
+    """Render the busiest pages as USERNAME and fail if any exceeds its query budget."""
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f'No user named {username}')
+    
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    
+    over_budget = []
+    for path, budget in PAGE_QUERY_BUDGETS.items():
+        # A fresh context per page, as in production: the command's own context would
+        # otherwise share `g` and the session's identity map across the requests
+        with app.app_context(), QueryCounter(db.engine) as queries:
+            response = client.get(path)
+        click.echo(f'{path}: {queries.count} queries (budget {budget}, HTTP {response.status_code})')
+        if queries.count > budget:
+            over_budget.append(path)
+            for statement in queries.statements:
+                click.echo(f'    {" ".join(statement.split())[:120]}')
+    
+    if over_budget:
+        raise click.ClickException(f"Over query budget: {', '.join(over_budget)}")
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the forum and product full-text search indexes."""
+    started = time.monotonic()
+    rebuild_search_index(db.session.connection())
+    db.session.commit()
+    click.echo(f'Rebuilt the search indexes in {time.monotonic() - started:.1f}s')
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint, precompress and resize static files into static/dist."""
+    manifest = build_assets(app.static_folder)
+    click.echo(f"Built {len(manifest['files'])} files, {len(manifest['encodings'])} precompressed "
+               f"and {len(manifest['thumbnails'])} thumbnails into static/dist")
+
+@app.cli.command('check-engine-profile')
+def check_engine_profile_command():
+    """Show the database engine profile and fail if its settings did not take effect."""
+    click.echo(describe_database())
+    problems = []
+    for engine in [db.engine] + replica_engines(db):
+        problems += check_engine_profile(engine, app.config['DB_ENGINE_PROFILE'], app.config)[1]
+    if problems:
+        raise click.ClickException('; '.join(problems))
+
+@app.cli.command('sync-sqlite-replicas')
+def sync_sqlite_replicas_command():
+    """Copy the SQLite database over each SQLite replica, to test replica reads locally."""
+    engines = replica_engines(db)
+    if not engines:
+        raise click.ClickException('DATABASE_REPLICA_URLS is not set')
+    if db.engine.dialect.name != 'sqlite' or any(engine.dialect.name != 'sqlite' for engine in engines):
+        raise click.ClickException('The database and all replicas must be SQLite files')
+    for engine in engines:
+        engine.dispose()
+        copy_sqlite_database(db.engine.url, engine.url)
+        click.echo(f'Copied {db.engine.url.database} to {engine.url.database}')
+
+@app.cli.command('tune-password-hash')
+@click.option('--target-ms', default=250, show_default=True, help='CPU time one sign-in may spend hashing.')
+@click.option('--kind', type=click.Choice(['scrypt', 'pbkdf2']), default='scrypt', show_default=True)
+def tune_password_hash_command(target_ms, kind):
+    """Find the strongest password hash method that fits a per-login time budget."""
+    current = app.config['PASSWORD_HASH_METHOD']
+    click.echo(f'Current method {current}: {time_method(current) * 1000:.0f}ms per hash')
+    method, seconds = tune_method(kind, target_ms / 1000)
+    click.echo(f'{method}: {seconds * 1000:.0f}ms per hash')
+    if seconds > target_ms / 1000:
+        click.echo(f'Even the weakest {kind} setting tried exceeds {target_ms}ms on this machine')
+    click.echo(f'Set PASSWORD_HASH_METHOD={method}')
+
 def create_tables():
     with app.app_context():
         db.create_all()
+        create_search_index(db.session.connection())
+        db.session.commit()
         
         if not Product.query.first():
             # Prices in Indian Rupees (₹)
@@ -0,0 +1,180 @@
+"""
+Static asset pipeline.
+
+`flask --app app build-assets` copies every file under static/ to static/dist/
+under a content-hashed name, writes gzip and brotli variants of text assets and
+resized WebP thumbnails of the images, and records it all in
+static/dist/manifest.json. When that manifest exists, url_for('static', ...)
+points at the fingerprinted copies, which are served with far-future immutable
+caching and in the best encoding the client accepts.
+"""
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # brotli variants are skipped
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are skipped
+    Image = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Text assets worth compressing; images are already compressed
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+# Shop grid cards are about 260px wide, so 400px stays sharp on most phone screens
+THUMBNAIL_WIDTH = 400
+THUMBNAIL_QUALITY = 75
+# Compressed variants smaller than this are not worth the extra request handling
+MIN_COMPRESS_SIZE = 256
+
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+def _fingerprint(name, data, suffix=None):
+    """
+    'css/style.css' -> 'css/style.3f2a9c1d7b0e.css'
+    """
+    stem, extension = os.path.splitext(name)
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return f'{stem}.{digest}{suffix or extension}'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _thumbnail(source_path):
+    """
+    WebP bytes of the image scaled down to THUMBNAIL_WIDTH (never up)
+    """
+    with Image.open(source_path) as image:
+        image = image.convert('RGB')
+        if image.width > THUMBNAIL_WIDTH:
+            height = round(image.height * THUMBNAIL_WIDTH / image.width)
+            image = image.resize((THUMBNAIL_WIDTH, height), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, 'WEBP', quality=THUMBNAIL_QUALITY, method=6)
+        return output.getvalue()
+
+
+def build_assets(static_folder):
+    """
+    Rebuild static/dist and its manifest from the files under `static_folder`.
+    Returns the manifest.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    manifest = {'files': {}, 'thumbnails': {}, 'encodings': {}}
+
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist)
+        for filename in sorted(files):
+            source_path = os.path.join(root, filename)
+            name = os.path.relpath(source_path, static_folder).replace(os.sep, '/')
+            with open(source_path, 'rb') as f:
+                data = f.read()
+
+            built = _fingerprint(name, data)
+            _write(os.path.join(dist, built), data)
+            manifest['files'][name] = built
+
+            extension = os.path.splitext(name)[1].lower()
+            if extension in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_SIZE:
+                encodings = []
+                if brotli is not None:
+                    _write(os.path.join(dist, built + '.br'), brotli.compress(data, quality=11))
+                    encodings.append('br')
+                _write(os.path.join(dist, built + '.gz'), gzip.compress(data, compresslevel=9, mtime=0))
+                encodings.append('gzip')
+                manifest['encodings'][built] = encodings
+
+            if extension in IMAGE_EXTENSIONS and Image is not None:
+                thumbnail = _thumbnail(source_path)
+                thumbnail_name = _fingerprint(name, thumbnail, suffix=f'.{THUMBNAIL_WIDTH}w.webp')
+                _write(os.path.join(dist, thumbnail_name), thumbnail)
+                manifest['thumbnails'][name] = thumbnail_name
+
+    _write(os.path.join(dist, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def load_manifest(static_folder):
+    """
+    The manifest written by build_assets(), or None if assets were not built
+    """
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def init_assets(app):
+    """
+    Point url_for('static', ...) at fingerprinted assets when a manifest
+    exists, serve them with immutable caching and precompressed encodings,
+    and add a `thumbnail_url(filename)` template helper
+    """
+    manifest = load_manifest(app.static_folder)
+    app.extensions['assets'] = manifest
+    files = manifest['files'] if manifest else {}
+    thumbnails = manifest['thumbnails'] if manifest else {}
+    encodings = manifest['encodings'] if manifest else {}
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in files:
+            values['filename'] = f"{DIST_DIR}/{files[values['filename']]}"
+
+    def thumbnail_url(filename):
+        """
+        URL of the WebP thumbnail of an image under static/, or None if none was built
+        """
+        if filename in thumbnails:
+            return app.url_for('static', filename=f'{DIST_DIR}/{thumbnails[filename]}')
+        return None
+
+    app.jinja_env.globals['thumbnail_url'] = thumbnail_url
+
+    def serve_static(filename):
+        if not filename.startswith(f'{DIST_DIR}/'):
+            return app.send_static_file(filename)
+
+        built = filename[len(DIST_DIR) + 1:]
+        available = encodings.get(built, [])
+        response = None
+        for encoding in available:
+            if encoding in request.accept_encodings:
+                suffix = '.br' if encoding == 'br' else '.gz'
+                mimetype = mimetypes.guess_type(built)[0] or 'application/octet-stream'
+                response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        if response is None:
+            response = send_from_directory(app.static_folder, filename)
+        if available:
+            response.vary.add('Accept-Encoding')
+
+        # The name changes whenever the content does, so the file never needs revalidating
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = ONE_YEAR
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions['static'] = serve_static
@@ -0,0 +1,24 @@
+"""
+Load tests for the app.
+
+    python -m benchmarks.seed                        # 100k users, 1M order lines, 500k forum posts and comments
+    python -m benchmarks.run --workers 4 --concurrency 32 --duration 30
+
+seed.py fills the database, fake_weather.py stands in for OpenWeatherMap, and
+run.py starts gunicorn against both, drives the scenarios and writes a JSON
+report to benchmarks/results/ that a later run can --compare against.
+"""
+
+# Shared by seed.py, which creates the data, and run.py, which drives it
+BENCH_PASSWORD = 'benchmark'
+
+CITIES = [
+    'Pune,IN', 'Nashik,IN', 'Nagpur,IN', 'Aurangabad,IN', 'Solapur,IN', 'Kolhapur,IN', 'Indore,IN',
+    'Bhopal,IN', 'Jaipur,IN', 'Jodhpur,IN', 'Ludhiana,IN', 'Amritsar,IN', 'Patiala,IN', 'Karnal,IN',
+    'Hisar,IN', 'Meerut,IN', 'Agra,IN', 'Lucknow,IN', 'Kanpur,IN', 'Varanasi,IN', 'Patna,IN',
+    'Ranchi,IN', 'Raipur,IN', 'Guntur,IN', 'Warangal,IN', 'Mysuru,IN', 'Belagavi,IN', 'Hubli,IN',
+    'Coimbatore,IN', 'Madurai,IN', 'Thanjavur,IN', 'Rajkot,IN', 'Anand,IN', 'Surat,IN', 'Cuttack,IN',
+    'Guwahati,IN', 'Siliguri,IN', 'Bathinda,IN', 'Sangli,IN', 'Latur,IN',
+]
+CROPS = ['wheat', 'rice', 'cotton', 'sugarcane', 'soybean', 'maize', 'onion', 'tomato', 'potato',
+         'chickpea', 'mustard', 'groundnut', 'bajra', 'jowar', 'tur', 'grapes', 'pomegranate', 'banana']
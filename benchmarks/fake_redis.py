@@ -0,0 +1,153 @@
+"""
+Local stand-in for a Redis server, so RedisCache can be tried and tested
+without installing Redis.
+
+    python -m benchmarks.fake_redis --port 6399
+    CACHE_URL=redis://127.0.0.1:6399/0 flask --app app run
+
+Speaks RESP and implements only the commands RedisCache sends: PING, AUTH,
+SELECT, GET, SET (with NX and PX), INCR, PEXPIRE, DEL and SCAN. Keys live in
+one in-memory dict per database and expire lazily, like Redis does on access.
+"""
+import argparse
+import fnmatch
+import socketserver
+import threading
+import time
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, password=None):
+        super().__init__(address, FakeRedisHandler)
+        self.password = password
+        self.databases = {}
+        self.commands = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'redis://{host}:{port}/0'
+
+    def start(self):
+        """
+        Serve from a daemon thread; returns the server
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        self.db = 0
+        self.authenticated = self.server.password is None
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            with self.server.lock:
+                self.server.commands += 1
+                reply = self._execute(args[0].upper().decode(), args[1:])
+            self.wfile.write(reply)
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _execute(self, command, args):
+        if command == 'AUTH':
+            self.authenticated = args[-1].decode() == self.server.password
+            return b'+OK\r\n' if self.authenticated else b'-WRONGPASS invalid password\r\n'
+        if not self.authenticated:
+            return b'-NOAUTH Authentication required.\r\n'
+        handler = getattr(self, f'_{command.lower()}', None)
+        if handler is None:
+            return f"-ERR unknown command '{command}'\r\n".encode()
+        return handler(self.server.databases.setdefault(self.db, {}), args)
+
+    def _live(self, store, key):
+        entry = store.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del store[key]
+            return None
+        return entry
+
+    def _ping(self, store, args):
+        return b'+PONG\r\n'
+
+    def _select(self, store, args):
+        self.db = int(args[0])
+        return b'+OK\r\n'
+
+    def _get(self, store, args):
+        entry = self._live(store, args[0])
+        return b'$-1\r\n' if entry is None else _bulk(entry[0])
+
+    def _set(self, store, args):
+        key, value = args[0], args[1]
+        options = [arg.upper() for arg in args[2:]]
+        expires_at = None
+        if b'PX' in options:
+            expires_at = time.monotonic() + int(args[2 + options.index(b'PX') + 1]) / 1000
+        if b'NX' in options and self._live(store, key) is not None:
+            return b'$-1\r\n'
+        store[key] = (value, expires_at)
+        return b'+OK\r\n'
+
+    def _incr(self, store, args):
+        entry = self._live(store, args[0])
+        try:
+            value = int(entry[0]) + 1 if entry is not None else 1
+        except ValueError:
+            return b'-ERR value is not an integer or out of range\r\n'
+        store[args[0]] = (str(value).encode(), entry[1] if entry is not None else None)
+        return b':%d\r\n' % value
+
+    def _pexpire(self, store, args):
+        entry = self._live(store, args[0])
+        if entry is None:
+            return b':0\r\n'
+        store[args[0]] = (entry[0], time.monotonic() + int(args[1]) / 1000)
+        return b':1\r\n'
+
+    def _del(self, store, args):
+        deleted = sum(1 for key in args if self._live(store, key) is not None and store.pop(key))
+        return b':%d\r\n' % deleted
+
+    def _scan(self, store, args):
+        # One pass returns everything, with cursor 0 to say the scan is done
+        options = [arg.upper() for arg in args[1:]]
+        pattern = args[1 + options.index(b'MATCH') + 1].decode() if b'MATCH' in options else '*'
+        keys = [key for key in list(store) if self._live(store, key) is not None
+                and fnmatch.fnmatchcase(key.decode(), pattern)]
+        return b'*2\r\n' + _bulk(b'0') + b'*%d\r\n' % len(keys) + b''.join(_bulk(key) for key in keys)
+
+
+def _bulk(data):
+    return b'$%d\r\n%s\r\n' % (len(data), data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6399)
+    parser.add_argument('--password')
+    args = parser.parse_args()
+
+    server = FakeRedisServer((args.host, args.port), args.password)
+    print(f'Fake Redis on {server.url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Local stand-in for the OpenWeatherMap API, so load tests measure the app and
+not the real upstream (or its rate limits).
+
+    python -m benchmarks.fake_weather --port 8765 --latency 0.08 --error-rate 0.02
+
+Serves /weather and /forecast (40 three-hour slots) for any ?q=, answering
+after `latency` seconds (plus up to `jitter` more) and failing `error_rate` of
+requests with a 503. Locations in `unknown_locations` get a 404, like a city
+OpenWeatherMap does not know.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def forecast_payload(location, now=None):
+    # The same location always gets the same weather
+    seed = zlib.crc32(location.lower().encode('utf-8'))
+    now = int(now or time.time()) // 10800 * 10800
+    slots = []
+    for i in range(40):
+        rainy = (seed + i) % 7 == 0
+        temp = 18 + seed % 15 + (i % 8) - 4
+        slot = {
+            'dt': now + i * 10800,
+            'main': {'temp': temp, 'temp_min': temp - 2, 'temp_max': temp + 2, 'humidity': 40 + (seed + i) % 50},
+            'weather': [{'main': 'Rain' if rainy else 'Clear', 'icon': '10d' if rainy else '01d',
+                         'description': 'moderate rain' if rainy else 'clear sky'}],
+            'wind': {'speed': (seed + i) % 12},
+        }
+        if rainy:
+            slot['rain'] = {'3h': 2.5 + seed % 10}
+        slots.append(slot)
+    return {'cod': '200', 'list': slots, 'city': {'name': location.split(',')[0], 'timezone': 19800}}
+
+
+def current_payload(location):
+    slot = forecast_payload(location)['list'][0]
+    return {'name': location.split(',')[0], 'main': slot['main'], 'weather': slot['weather'], 'wind': slot['wind']}
+
+
+class FakeWeatherServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0):
+        super().__init__(address, FakeWeatherHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.unknown_locations = set()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """
+        Serve from a daemon thread; returns the server
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeWeatherHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server._lock:
+            server.requests += 1
+        time.sleep(server.latency + random.random() * server.jitter)
+
+        url = urlparse(self.path)
+        location = parse_qs(url.query).get('q', ['Pune,IN'])[0]
+        if random.random() < server.error_rate:
+            self._send(503, {'cod': 503, 'message': 'service unavailable'})
+        elif location.split(',')[0].strip().lower() in server.unknown_locations:
+            self._send(404, {'cod': '404', 'message': 'city not found'})
+        elif url.path.endswith('/forecast'):
+            self._send(200, forecast_payload(location))
+        elif url.path.endswith('/weather'):
+            self._send(200, current_payload(location))
+        else:
+            self._send(404, {'cod': '404', 'message': 'not found'})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds before every response')
+    parser.add_argument('--jitter', type=float, default=0.05, help='up to this many extra seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered 503')
+    args = parser.parse_args()
+
+    server = FakeWeatherServer((args.host, args.port), args.latency, args.jitter, args.error_rate)
+    print(f'Fake OpenWeatherMap on {server.url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
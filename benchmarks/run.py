@@ -0,0 +1,311 @@
+"""
+Run the load-test scenarios against gunicorn and save a JSON report.
+
+    python -m benchmarks.run --workers 4 --concurrency 32 --duration 30
+    python -m benchmarks.run --compare benchmarks/results/<earlier>.json
+
+Unless --url points at a running server, this starts the fake weather API and
+`gunicorn app:app` on DATABASE_URL, which must hold data from
+benchmarks.seed. Each scenario then runs on its own: `concurrency` threads, each
+signed in as a random bench<n> user, loop over the scenario's requests for
+`duration` seconds after `warmup`. The report records throughput and
+p50/p95/p99 latency per scenario and per request. With --compare, it exits
+non-zero if a scenario's p95 or throughput got worse by more than --tolerance.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import requests
+
+from benchmarks import BENCH_PASSWORD, CITIES, CROPS
+from benchmarks.fake_weather import FakeWeatherServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+POST_LINK = re.compile(r'/forum/post/(\d+)')
+PRODUCT_ID = re.compile(r'data-add-to-cart="(\d+)"')
+
+
+class Client:
+    """
+    A signed-in user's session that times every request
+    """
+
+    def __init__(self, base_url, samples, recording):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.samples = samples
+        self.recording = recording
+        self.rng = random.Random()
+        self.iteration = 0
+
+    def sign_in(self, username):
+        response = self.session.post(f'{self.base_url}/login',
+                                     data={'username': username, 'password': BENCH_PASSWORD})
+        if '/dashboard' not in response.url:
+            raise RuntimeError(f'Could not sign in as {username}; run benchmarks.seed first')
+
+    def request(self, step, method, path, **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f'{self.base_url}{path}', timeout=30, **kwargs)
+            failed = response.status_code >= 400
+        except requests.RequestException:
+            response, failed = None, True
+        if self.recording.is_set():
+            self.samples.append((step, time.perf_counter() - started, failed))
+        return response
+
+
+def dashboard(client):
+    client.request('dashboard', 'GET', '/dashboard')
+
+
+def forum(client):
+    rng = client.rng
+    response = client.request('forum', 'GET', '/forum')
+    client.request('forum category', 'GET', f"/forum?category={rng.choice(['crops', 'weather', 'schemes'])}&sort=active")
+    posts = POST_LINK.findall(response.text) if response is not None else []
+    if posts:
+        client.request('forum post', 'GET', f'/forum/post/{rng.choice(posts)}')
+    client.request('forum search', 'GET', f'/forum/search?q={rng.choice(CROPS)}')
+
+
+def shop(client):
+    rng = client.rng
+    client.request('shop', 'GET', '/shop')
+    client.request('shop search', 'GET', f'/shop?q={rng.choice(CROPS)}')
+    client.request('shop filter', 'GET', f"/shop?category=Organic&sort={rng.choice(['price_low', 'price_high', 'newest'])}")
+    client.request('shop page', 'GET', f'/shop?page={rng.randint(2, 10)}')
+
+
+def cart(client):
+    rng = client.rng
+    response = client.request('shop', 'GET', f'/shop?q={rng.choice(CROPS)}')
+    products = PRODUCT_ID.findall(response.text) if response is not None else []
+    if products:
+        client.request('add to cart', 'POST', '/api/cart/items',
+                       json={'product_id': int(rng.choice(products)), 'quantity': 1},
+                       headers={'Idempotency-Key': uuid.uuid4().hex})
+    client.request('cart', 'GET', '/cart')
+    client.iteration += 1
+    # Most visits end without buying
+    if client.iteration % 4 == 0:
+        client.request('checkout', 'GET', '/checkout')
+        client.request('orders', 'GET', '/orders')
+
+
+def weather(client):
+    rng = client.rng
+    client.request('weather', 'GET', f'/api/weather/{rng.choice(CITIES)}')
+    client.request('weather batch', 'GET', f"/api/weather?locations={';'.join(rng.sample(CITIES, 10))}")
+
+
+SCENARIOS = {
+    'dashboard': dashboard,
+    'forum': forum,
+    'shop': shop,
+    'cart': cart,
+    'weather': weather,
+}
+
+
+def percentile(sorted_values, fraction):
+    # Nearest rank
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(samples, duration):
+    latencies = sorted(elapsed for _, elapsed, _ in samples)
+    points = {
+        'mean': sum(latencies) / len(latencies) if latencies else None,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1] if latencies else None,
+    }
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, failed in samples if failed),
+        'throughput_rps': round(len(samples) / duration, 2),
+        'latency_ms': {name: round(value * 1000, 2) if value is not None else None for name, value in points.items()},
+    }
+
+
+def run_scenario(name, base_url, args):
+    samples = []
+    recording = threading.Event()
+    stop = threading.Event()
+    errors = []
+
+    def user(number):
+        client = Client(base_url, samples, recording)
+        client.rng.seed(f'{args.seed}:{name}:{number}')
+        try:
+            client.sign_in(f'bench{client.rng.randint(1, args.users)}')
+            while not stop.is_set():
+                SCENARIOS[name](client)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=user, args=(n,), daemon=True) for n in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    stop.wait(args.warmup)
+    recording.set()
+    started = time.perf_counter()
+    stop.wait(args.duration)
+    recording.clear()
+    duration = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    result = summarize(samples, duration)
+    steps = {}
+    for sample in samples:
+        steps.setdefault(sample[0], []).append(sample)
+    result['steps'] = {step: summarize(step_samples, duration) for step, step_samples in sorted(steps.items())}
+    return result
+
+
+def start_server(args, weather_url):
+    env = dict(os.environ, WEATHER_API_URL=weather_url, WEATHER_API_KEY='benchmark')
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '--workers', str(args.workers),
+               '--threads', str(args.threads), '--bind', f'127.0.0.1:{args.port}']
+    server = subprocess.Popen(command, cwd=ROOT, env=env)
+    base_url = f'http://127.0.0.1:{args.port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f'gunicorn exited with status {server.returncode}')
+        try:
+            requests.get(f'{base_url}/login', timeout=1)
+            return server, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit('gunicorn did not start within 30s')
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+def compare(report, baseline, tolerance):
+    """
+    Print how each scenario moved against `baseline`; returns the scenarios
+    that regressed by more than `tolerance`
+    """
+    regressions = []
+    print(f"\nAgainst {baseline['git']['commit']} ({baseline['started_at']}):")
+    for name, result in report['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if not before:
+            continue
+        p95, p95_before = result['latency_ms']['p95'], before['latency_ms']['p95']
+        rps, rps_before = result['throughput_rps'], before['throughput_rps']
+        p95_change = (p95 - p95_before) / p95_before if p95_before else 0
+        rps_change = (rps - rps_before) / rps_before if rps_before else 0
+        worse = p95_change > tolerance or rps_change < -tolerance
+        print(f'  {name:10} p95 {p95_before:8.1f} -> {p95:8.1f} ms ({p95_change:+.0%})   '
+              f'{rps_before:8.1f} -> {rps:8.1f} req/s ({rps_change:+.0%}){"   REGRESSION" if worse else ""}')
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the app and save a JSON report.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated, from: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--url', help='test this running server instead of starting gunicorn')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--concurrency', type=int, default=16, help='simulated users per scenario')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds per scenario')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds before each scenario')
+    parser.add_argument('--users', type=int, default=1000, help='sign in as bench1 .. bench<users>')
+    parser.add_argument('--weather-latency', type=float, default=0.08)
+    parser.add_argument('--weather-jitter', type=float, default=0.04)
+    parser.add_argument('--weather-error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='report path (default benchmarks/results/<time>-<commit>.json)')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed p95/throughput change before failing')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    weather = server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        weather = FakeWeatherServer(('127.0.0.1', 0), args.weather_latency, args.weather_jitter,
+                                    args.weather_error_rate).start()
+        server, base_url = start_server(args, weather.url)
+
+    report = {
+        'started_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'git': git_revision(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'scenarios': {},
+    }
+    try:
+        for name in scenarios:
+            result = run_scenario(name, base_url, args)
+            report['scenarios'][name] = result
+            latency = result['latency_ms']
+            print(f"{name:10} {result['throughput_rps']:8.1f} req/s   p50 {latency['p50']:7.1f}   "
+                  f"p95 {latency['p95']:7.1f}   p99 {latency['p99']:7.1f} ms   {result['errors']} errors")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    if weather is not None:
+        report['weather_upstream_requests'] = weather.requests
+        weather.shutdown()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.utcnow():%Y%m%d-%H%M%S}-{report['git']['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Report saved to {output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            raise SystemExit(f"Regressed: {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
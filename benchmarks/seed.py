@@ -0,0 +1,223 @@
+"""
+Fill the database in DATABASE_URL with benchmark-sized data.
+
+    python -m benchmarks.seed                 # 100k users, 1M order lines, 500k posts + comments
+    python -m benchmarks.seed --scale 0.01    # the same shape, 1% of the size
+
+Every user is named bench<n> with password BENCH_PASSWORD, so the load test
+can sign in as any of them. The same --seed always produces the same data.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from benchmarks import BENCH_PASSWORD, CITIES, CROPS
+from passwords import hash_password
+from app import (app, db, app_cache, create_tables, User, Product, Order, OrderHeader, ForumPost, ForumComment,
+                 CATALOG_FACETS_KEY)
+
+BATCH_SIZE = 10000
+
+SOIL_TYPES = ['Alluvial', 'Black', 'Red', 'Laterite', 'Sandy', 'Clay', 'Loamy']
+FORUM_CATEGORIES = ['crops', 'weather', 'schemes', 'general']
+PRODUCT_CATEGORIES = ['General Purpose', 'Organic', 'Vegetable', 'Nitrogen Fertilizer', 'Phosphorus Fertilizer',
+                      'Potassium Fertilizer', 'Micronutrient', 'Secondary Nutrient', 'Soil Conditioner', 'Herbicide']
+PRODUCT_IMAGES = ['fertilizer1.jpg', 'fertilizer2.jpg', 'fertilizer3.jpg', 'fertilizer4.jpg', 'fertilizer5.jpg',
+                  'fertilizer6.jpg', 'urea.jpg', 'zinc.jpg', 'humic.jpg', 'sulphur.jpg']
+WORDS = (CROPS + [
+    'rain', 'monsoon', 'irrigation', 'drip', 'sprinkler', 'borewell', 'canal', 'harvest', 'sowing', 'seed',
+    'variety', 'yield', 'acre', 'quintal', 'mandi', 'price', 'msp', 'subsidy', 'loan', 'insurance', 'pm-kisan',
+    'fertilizer', 'urea', 'dap', 'potash', 'compost', 'manure', 'vermicompost', 'mulch', 'pest', 'aphid',
+    'bollworm', 'blight', 'rust', 'wilt', 'fungicide', 'spray', 'neem', 'organic', 'soil', 'ph', 'nitrogen',
+    'zinc', 'tractor', 'labour', 'storage', 'cold', 'heat', 'frost', 'hail', 'drought', 'flood', 'forecast',
+    'kharif', 'rabi', 'zaid', 'nursery', 'transplant', 'weeding', 'pruning', 'market', 'transport', 'cooperative',
+    'the', 'my', 'this', 'year', 'field', 'plants', 'leaves', 'after', 'before', 'week', 'good', 'poor', 'best',
+    'how', 'what', 'when', 'should', 'use', 'help', 'advice', 'problem', 'खेती', 'बारिश', 'फसल', 'खाद',
+])
+
+
+def sentence(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize() + '.'
+
+
+def insert(table, rows):
+    """
+    Core executemany in batches; `rows` may be a generator
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+    db.session.commit()
+
+
+def next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def seed_users(rng, count, now):
+    # One hash shared by every user; signing in still pays the configured cost
+    password = hash_password(BENCH_PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+    first = next_id(User)
+
+    def rows():
+        for n in range(count):
+            yield {
+                'id': first + n,
+                'username': f'bench{n + 1}',
+                'email': f'bench{n + 1}@example.com',
+                'password': password,
+                'created_at': now - timedelta(days=rng.random() * 730),
+                'farm_location': rng.choice(CITIES) if rng.random() < 0.9 else None,
+                'farm_size': round(rng.uniform(0.5, 25), 1),
+                'crops': ', '.join(rng.sample(CROPS, rng.randint(1, 3))),
+                'phone': f'9{rng.randrange(10 ** 9):09d}',
+                'language': 'hi' if rng.random() < 0.3 else 'en',
+                'soil_type': rng.choice(SOIL_TYPES),
+                'subscription': rng.random() < 0.15,
+            }
+
+    insert(User.__table__, rows())
+    return list(range(first, first + count))
+
+
+def seed_products(rng, count):
+    first = next_id(Product)
+
+    def rows():
+        for n in range(count):
+            crop = rng.choice(CROPS)
+            yield {
+                'id': first + n,
+                'name': f'{crop.title()} {rng.choice(["Booster", "Gold", "Plus", "Shakti", "Organic Mix", "Special"])} {n + 1}',
+                'description': f'Formulated for {crop}. ' + sentence(rng, 12, 30),
+                'price': rng.randrange(99, 2999),
+                'image': rng.choice(PRODUCT_IMAGES),
+                'category': rng.choice(PRODUCT_CATEGORIES),
+                'in_stock': rng.random() < 0.95,
+                # Untracked stock, so checkout scenarios never run out
+                'stock_quantity': None,
+            }
+
+    insert(Product.__table__, rows())
+    products = db.session.query(Product.id, Product.price).filter(Product.in_stock.is_(True)).all()
+    app_cache.delete(CATALOG_FACETS_KEY)
+    return products
+
+
+def seed_orders(rng, count, users, products, now):
+    """
+    `count` order lines: about 2% sit in carts, the rest belong to placed orders
+    of one to six lines
+    """
+    cart_lines = int(count * 0.02)
+    carts = set()
+    while len(carts) < cart_lines:
+        carts.add((rng.choice(users), rng.choice(products)))
+
+    headers = []
+    lines = []
+    header_id = next_id(OrderHeader)
+    while len(lines) < count - cart_lines:
+        user_id = rng.choice(users)
+        created_at = now - timedelta(days=rng.random() * 365)
+        item_count = total = 0
+        for product_id, price in rng.sample(products, min(len(products), rng.randint(1, 6))):
+            quantity = rng.randint(1, 5)
+            lines.append({'user_id': user_id, 'product_id': product_id, 'quantity': quantity,
+                          'order_date': created_at, 'status': 'Ordered', 'header_id': header_id,
+                          'unit_price': price})
+            item_count += quantity
+            total += quantity * price
+        headers.append({'id': header_id, 'user_id': user_id, 'created_at': created_at, 'status': 'Placed',
+                        'item_count': item_count, 'total': total})
+        header_id += 1
+
+    insert(OrderHeader.__table__, headers)
+    insert(Order.__table__, lines)
+    insert(Order.__table__, ({'user_id': user_id, 'product_id': product_id, 'quantity': rng.randint(1, 3),
+                              'order_date': now - timedelta(days=rng.random() * 7), 'status': 'Cart'}
+                             for user_id, (product_id, _) in carts))
+    return len(headers)
+
+
+def seed_forum(rng, posts, comments, users, now):
+    first_post = next_id(ForumPost)
+    posted = [now - timedelta(days=rng.random() * 730) for _ in range(posts)]
+    # Cubing skews replies towards a few busy threads, like a real forum
+    replies = [first_post + int(posts * rng.random() ** 3) for _ in range(comments)]
+    comment_count = [0] * posts
+    last_activity = list(posted)
+    reply_dates = []
+    for post_id in replies:
+        index = post_id - first_post
+        date = posted[index] + timedelta(hours=rng.random() * 24 * 30)
+        reply_dates.append(date)
+        comment_count[index] += 1
+        last_activity[index] = max(last_activity[index], date)
+
+    insert(ForumPost.__table__, ({
+        'id': first_post + n,
+        'title': sentence(rng, 4, 10)[:-1] + '?',
+        'content': ' '.join(sentence(rng, 8, 20) for _ in range(rng.randint(1, 5))),
+        'date_posted': posted[n],
+        'user_id': rng.choice(users),
+        'category': rng.choice(FORUM_CATEGORIES),
+        'comment_count': comment_count[n],
+        'last_activity_at': last_activity[n],
+    } for n in range(posts)))
+    insert(ForumComment.__table__, ({
+        'content': ' '.join(sentence(rng, 5, 15) for _ in range(rng.randint(1, 3))),
+        'date_posted': date,
+        'user_id': rng.choice(users),
+        'post_id': post_id,
+    } for post_id, date in zip(replies, reply_dates)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill DATABASE_URL with benchmark data.')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every count by this')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=1000000, help='order lines, cart rows included')
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--comments', type=int, default=400000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    def scaled(count):
+        return max(1, int(count * args.scale))
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    create_tables()
+    with app.app_context():
+        if User.query.filter_by(username='bench1').first():
+            raise SystemExit('Benchmark data is already seeded in this database')
+
+        started = time.monotonic()
+        users = seed_users(rng, scaled(args.users), now)
+        print(f'{len(users)} users')
+        products = seed_products(rng, scaled(args.products))
+        print(f'{scaled(args.products)} products')
+        placed = seed_orders(rng, scaled(args.orders), users, products, now)
+        print(f'{scaled(args.orders)} order lines in {placed} orders')
+        seed_forum(rng, scaled(args.posts), scaled(args.comments), users, now)
+        print(f'{scaled(args.posts)} forum posts and {scaled(args.comments)} comments')
+
+        if db.engine.dialect.name == 'sqlite':
+            # Fresh statistics so the planner sees the benchmark-sized tables
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+        print(f'Seeded in {time.monotonic() - started:.0f}s')
+
+
+if __name__ == '__main__':
+    main()
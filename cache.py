@@ -0,0 +1,557 @@
+"""
+Caching helpers shared by the weather, market price and template fragment paths.
+
+Three interchangeable backends implement get/set/add/incr/delete/clear:
+
+- LRUCache: in-process, per gunicorn worker
+- SQLiteCache: one file shared by every worker on the box
+- RedisCache: any server speaking the Redis protocol
+
+Use create_cache() to build one from a CACHE_URL such as "memory://",
+"sqlite:////tmp/farmers-cache.db" or "redis://localhost:6379/0".
+"""
+import functools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class LRUCache:
+    """
+    Thread-safe in-process cache with per-entry expiry and LRU eviction
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, ttl=None):
+        """
+        Set `key` only if it is missing or expired. Returns True if it was set.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (item[1] is None or item[1] > time.time()):
+                return False
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return True
+
+    def incr(self, key, ttl=None):
+        """
+        Add one to the counter at `key` and return the new count. A missing or
+        expired counter starts again at 1 and expires `ttl` seconds later.
+        """
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or (item[1] is not None and item[1] <= now):
+                item = (0, now + ttl if ttl else None)
+            self._data[key] = (item[0] + 1, item[1])
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return item[0] + 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    Cache stored in a SQLite file, shared by every worker process on one host.
+    Values are stored as JSON. Eviction is approximately LRU on `max_entries`.
+    """
+
+    # Only rewrite accessed_at when it is older than this, so reads stay reads
+    TOUCH_INTERVAL = 30
+    EVICT_EVERY = 100
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_cache_accessed_at ON cache (accessed_at);
+        """)
+
+    def _connect(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                'SELECT value, expires_at, accessed_at FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at, accessed_at = row
+            if expires_at is not None and expires_at <= now:
+                conn.execute('DELETE FROM cache WHERE key = ? AND expires_at <= ?', (key, now))
+                return None
+            if now - accessed_at > self.TOUCH_INTERVAL:
+                conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+        except sqlite3.Error as e:
+            print(f"Cache read error: {e}")
+            return None
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        try:
+            self._connect().execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), now + ttl if ttl else None, now)
+            )
+            self._maybe_evict(now)
+        except sqlite3.Error as e:
+            print(f"Cache write error: {e}")
+
+    def add(self, key, value, ttl=None):
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('DELETE FROM cache WHERE key = ? AND expires_at <= ?', (key, now))
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                    (key, json.dumps(value), now + ttl if ttl else None, now)
+                )
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            print(f"Cache write error: {e}")
+            return False
+
+    def incr(self, key, ttl=None):
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('DELETE FROM cache WHERE key = ? AND expires_at <= ?', (key, now))
+                # The expiry is only set when the counter is created
+                conn.execute(
+                    'INSERT INTO cache (key, value, expires_at, accessed_at) VALUES (?, 1, ?, ?) '
+                    'ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1, accessed_at = excluded.accessed_at',
+                    (key, now + ttl if ttl else None, now)
+                )
+                (value,) = conn.execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+            return int(value)
+        except sqlite3.Error as e:
+            print(f"Cache write error: {e}")
+            return 0
+
+    def delete(self, key):
+        try:
+            self._connect().execute('DELETE FROM cache WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            print(f"Cache write error: {e}")
+
+    def clear(self):
+        try:
+            self._connect().execute('DELETE FROM cache')
+        except sqlite3.Error as e:
+            print(f"Cache write error: {e}")
+
+    def _maybe_evict(self, now):
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY:
+            return
+        conn = self._connect()
+        conn.execute('DELETE FROM cache WHERE expires_at <= ?', (now,))
+        (count,) = conn.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+
+class RedisError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+class RedisCache:
+    """
+    Cache backed by a Redis-protocol server (Redis, KeyDB, or a local stand-in).
+    Speaks just enough RESP for GET/SET/INCR/DEL/SCAN, so no client library is needed.
+    """
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None,
+                 prefix='farmers:', timeout=1.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile('rb'))
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            if self.password:
+                self._command('AUTH', self.password)
+            if self.db:
+                self._command('SELECT', self.db)
+        return conn
+
+    def _disconnect(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    def _command(self, *args):
+        sock, reader = self._connect()
+        parts = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        try:
+            sock.sendall(b''.join(parts))
+            return self._read_reply(reader)
+        except OSError:
+            self._disconnect()
+            raise
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by cache server')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            raise RedisError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length == -1:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self._read_reply(reader) for _ in range(length)]
+        raise RedisError(f'Unexpected reply: {line!r}')
+
+    def get(self, key):
+        try:
+            value = self._command('GET', self.prefix + key)
+        except (OSError, RedisError) as e:
+            print(f"Cache read error: {e}")
+            return None
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        args = ['SET', self.prefix + key, json.dumps(value)]
+        if ttl:
+            args += ['PX', int(ttl * 1000)]
+        try:
+            self._command(*args)
+        except (OSError, RedisError) as e:
+            print(f"Cache write error: {e}")
+
+    def add(self, key, value, ttl=None):
+        args = ['SET', self.prefix + key, json.dumps(value), 'NX']
+        if ttl:
+            args += ['PX', int(ttl * 1000)]
+        try:
+            return self._command(*args) == 'OK'
+        except (OSError, RedisError) as e:
+            print(f"Cache write error: {e}")
+            return False
+
+    def incr(self, key, ttl=None):
+        try:
+            value = self._command('INCR', self.prefix + key)
+            if value == 1 and ttl:
+                self._command('PEXPIRE', self.prefix + key, int(ttl * 1000))
+            return value
+        except (OSError, RedisError) as e:
+            print(f"Cache write error: {e}")
+            return 0
+
+    def delete(self, key):
+        try:
+            self._command('DEL', self.prefix + key)
+        except (OSError, RedisError) as e:
+            print(f"Cache write error: {e}")
+
+    def clear(self):
+        cursor = b'0'
+        try:
+            while True:
+                cursor, keys = self._command('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', 500)
+                if keys:
+                    self._command('DEL', *keys)
+                if cursor == b'0':
+                    break
+        except (OSError, RedisError) as e:
+            print(f"Cache write error: {e}")
+
+
+def create_cache(url):
+    """
+    Build a cache backend from a URL:
+
+    - memory://?max_entries=2048
+    - sqlite:////absolute/path/cache.db?max_entries=10000
+    - redis://[:password@]host:port/db
+    """
+    parsed = urlparse(url or 'memory://')
+    options = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+
+    if parsed.scheme == 'memory':
+        return LRUCache(max_entries=int(options.get('max_entries', 2048)))
+    if parsed.scheme == 'sqlite':
+        # sqlite:////tmp/x.db -> /tmp/x.db, sqlite:///x.db -> x.db
+        path = parsed.path[1:] if parsed.path.startswith('/') else parsed.path
+        return SQLiteCache(path, max_entries=int(options.get('max_entries', 10000)))
+    if parsed.scheme == 'redis':
+        return RedisCache(
+            host=parsed.hostname or 'localhost',
+            port=parsed.port or 6379,
+            db=int(parsed.path.lstrip('/') or 0),
+            password=parsed.password,
+            prefix=options.get('prefix', 'farmers:')
+        )
+    raise ValueError(f"Unsupported cache URL: {url}")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one: the first caller runs
+    the function and everyone who arrives while it is running waits for, and
+    shares, its result or exception. Built on threading primitives, so it also
+    coordinates greenlets once gevent has monkey-patched the threading module.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class StaleWhileRevalidateCache:
+    """
+    Serve a cached value while it is younger than `ttl` seconds. After that the
+    stale copy keeps being served for up to `stale_ttl` more seconds while one
+    background refresh per key fetches a new value. With a shared backend the
+    refresh is also claimed through the backend, so one worker refreshes for all.
+    Concurrent cold misses for a key share a single `loader()` call.
+    """
+
+    REFRESH_LEASE = 30
+
+    def __init__(self, backend, ttl, stale_ttl=0, prefix=''):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.prefix = prefix
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def get(self, key, loader):
+        """
+        Return the value for `key`, calling `loader()` on a cold miss.
+        Errors raised by `loader` on a miss propagate to the caller.
+        """
+        entry = self.backend.get(self.prefix + key)
+        if entry is not None:
+            value, stored_at = entry
+            if time.time() - stored_at >= self.ttl:
+                self._refresh_in_background(key, loader)
+            return value
+
+        return self._flight.do(key, lambda: self._load(key, loader))
+
+    def _load(self, key, loader):
+        # A flight that finished just before this one may have filled the entry
+        entry = self.backend.get(self.prefix + key)
+        if entry is not None:
+            return entry[0]
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.backend.set(self.prefix + key, (value, time.time()), ttl=self.ttl + self.stale_ttl)
+
+    def delete(self, key):
+        self.backend.delete(self.prefix + key)
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            if not self.backend.add(self.prefix + key + ':refreshing', 1, ttl=self.REFRESH_LEASE):
+                return
+            self._refreshing.add(key)
+
+        thread = threading.Thread(target=self._refresh, args=(key, loader), daemon=True)
+        thread.start()
+
+    def _refresh(self, key, loader):
+        try:
+            self.set(key, loader())
+        except Exception as e:
+            # Keep serving the stale copy; the next stale hit retries
+            print(f"Cache refresh error for {key!r}: {e}")
+        finally:
+            self.backend.delete(self.prefix + key + ':refreshing')
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+def memoize(backend, prefix, ttl):
+    """
+    Cache a function's JSON-serializable result in `backend`, keyed on its arguments
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = prefix + ':'.join(str(arg) for arg in args)
+            value = backend.get(key)
+            if value is None:
+                value = func(*args)
+                backend.set(key, value, ttl=ttl)
+            return value
+        return wrapper
+    return decorator
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Jinja tag that caches the rendered body of a block:
+
+        {% cache 'price-card', crop_name %} ... {% endcache %}
+
+    Every argument becomes part of the key, together with the template name.
+    The backend and TTL come from `environment.fragment_cache` and
+    `environment.fragment_cache_ttl`.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None, fragment_cache_ttl=300)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name or '')]
+        args.append(parser.parse_expression())
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_cache_support', [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache_support(self, key_parts, caller):
+        backend = self.environment.fragment_cache
+        if backend is None:
+            return caller()
+        key = 'fragment:' + ':'.join(str(part) for part in key_parts)
+        body = backend.get(key)
+        if body is None:
+            body = caller()
+            backend.set(key, body, ttl=self.environment.fragment_cache_ttl)
+        return body
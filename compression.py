@@ -0,0 +1,136 @@
+"""
+WSGI middleware that compresses responses and records how big they are.
+
+Responses are gzip or brotli encoded according to the client's
+Accept-Encoding when their content type is listed and they are large enough to
+be worth it. Responses that are already encoded (precompressed static files),
+streamed without a Content-Length, marked no-transform, or partial (a 206 or
+anything with Content-Range, whose byte offsets refer to the unencoded body)
+pass through as they are. Every response's size, before and after compression, is added up per
+route so page weight can be checked against a budget.
+"""
+import gzip
+import itertools
+import threading
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_options_header
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:  # only gzip is offered
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+    'application/javascript', 'application/json', 'application/xml', 'image/svg+xml',
+)
+
+# The app puts the matched URL rule here, so sizes are grouped per route and
+# not per URL
+ROUTE_ENVIRON_KEY = 'compression.route'
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class CompressionMiddleware:
+    """
+    Wrap a WSGI app:
+
+        app.wsgi_app = CompressionMiddleware(app.wsgi_app, min_size=500)
+    """
+
+    def __init__(self, app, mimetypes=DEFAULT_MIMETYPES, min_size=500, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.mimetypes = set(mimetypes)
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+        self.sizes = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        captured = []
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return written.append
+
+        body = self.app(environ, capture)
+        status, headers, exc_info = captured
+        headers = Headers(headers)
+        if written:
+            body = ClosingIterator(itertools.chain(written, body), getattr(body, 'close', None))
+
+        if not self._compressible(environ, status, headers):
+            self._record(environ, headers.get('Content-Length', type=int))
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return body
+
+        # The representation now depends on Accept-Encoding, even for clients that get it plain
+        headers['Vary'] = _add_vary(headers.get('Vary'))
+        encoding = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING')).best_match(self.encodings)
+        if encoding is None:
+            self._record(environ, headers.get('Content-Length', type=int))
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return body
+
+        try:
+            data = b''.join(body)
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(data, compresslevel=self.gzip_level)
+
+        headers['Content-Encoding'] = encoding
+        headers['Content-Length'] = str(len(compressed))
+        # A strong ETag promises byte-identical bodies, which differ per encoding
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            headers['ETag'] = f'W/{etag}'
+        self._record(environ, len(data), len(compressed))
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        return [compressed]
+
+    def _compressible(self, environ, status, headers):
+        if environ.get('REQUEST_METHOD') == 'HEAD' or 'Content-Encoding' in headers:
+            return False
+        if status.startswith('206') or 'Content-Range' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        length = headers.get('Content-Length', type=int)
+        if length is None or length < self.min_size:
+            return False
+        mimetype = parse_options_header(headers.get('Content-Type', ''))[0]
+        return mimetype in self.mimetypes
+
+    def _record(self, environ, size, sent=None):
+        if size is None:
+            return
+        sent = size if sent is None else sent
+        route = environ.get(ROUTE_ENVIRON_KEY, UNMATCHED_ROUTE)
+        with self._lock:
+            stats = self.sizes.setdefault(route, {'requests': 0, 'bytes': 0, 'sent': 0, 'max_bytes': 0, 'max_sent': 0})
+            stats['requests'] += 1
+            stats['bytes'] += size
+            stats['sent'] += sent
+            stats['max_bytes'] = max(stats['max_bytes'], size)
+            stats['max_sent'] = max(stats['max_sent'], sent)
+
+    def reset_sizes(self):
+        with self._lock:
+            self.sizes.clear()
+
+
+def _add_vary(vary):
+    if not vary:
+        return 'Accept-Encoding'
+    if 'accept-encoding' in vary.lower() or vary.strip() == '*':
+        return vary
+    return f'{vary}, Accept-Encoding'
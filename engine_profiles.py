@@ -0,0 +1,119 @@
+"""
+SQLAlchemy engine settings for each database backend.
+
+The profile follows the database URL unless DB_ENGINE_PROFILE names one:
+
+- sqlite: every new connection switches to WAL, so readers and the writer no
+  longer block each other, with synchronous=NORMAL (durable in WAL mode except
+  for the last commits before a power loss), a busy timeout so a worker waits
+  for the write lock instead of failing with "database is locked", and a
+  memory-mapped window for reads.
+- postgres: a bounded pool per worker, connections tested before use so a
+  restarted server or an idle timeout does not fail a request, and a
+  server-side statement timeout on every session.
+- none: SQLAlchemy's defaults.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PROFILES = ('sqlite', 'postgres', 'none')
+
+SYNCHRONOUS_LEVELS = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}
+
+
+def select_profile(url, requested='auto'):
+    if requested != 'auto':
+        if requested not in PROFILES:
+            raise ValueError(f"DB_ENGINE_PROFILE must be auto or one of {', '.join(PROFILES)}, not {requested!r}")
+        return requested
+    backend = make_url(url).get_backend_name()
+    if backend == 'sqlite':
+        return 'sqlite'
+    if backend in ('postgresql', 'postgres'):
+        return 'postgres'
+    return 'none'
+
+
+def engine_options(profile, config):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for `profile`
+    """
+    if profile != 'postgres':
+        return {}
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+    if config['DB_STATEMENT_TIMEOUT_MS']:
+        # libpq sends this with every new session, so it needs no extra round trip
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+def sqlite_pragmas(config):
+    return [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT_MS']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+    ]
+
+
+def install_engine_profile(engine, profile, config):
+    """
+    Apply the parts of `profile` that are set per connection. Call it before
+    the engine opens its first connection.
+    """
+    if profile != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def check_engine_profile(engine, profile, config):
+    """
+    Open a connection and read back the settings `profile` should have given
+    it. Returns (settings, problems); problems lists what did not take effect.
+    """
+    settings = {}
+    problems = []
+    with engine.connect() as connection:
+        if engine.dialect.name == 'sqlite':
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size'):
+                settings[name] = connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+            settings['synchronous'] = SYNCHRONOUS_LEVELS.get(settings['synchronous'], settings['synchronous'])
+        elif engine.dialect.name == 'postgresql':
+            settings['statement_timeout'] = connection.exec_driver_sql('SHOW statement_timeout').scalar()
+    if hasattr(engine.pool, 'size'):
+        settings['pool_size'] = engine.pool.size()
+    settings['pool_pre_ping'] = engine_options(profile, config).get('pool_pre_ping', False)
+
+    if profile == 'sqlite':
+        expected = {name: str(value).lower() for name, value in sqlite_pragmas(config)}
+        for name, value in settings.items():
+            # mmap_size is capped by SQLITE_MAX_MMAP_SIZE and is 0 on builds without mmap
+            if name in expected and name != 'mmap_size' and str(value).lower() != expected[name]:
+                problems.append(f'{name} is {value}, expected {expected[name]}')
+    return settings, problems
+
+
+def describe_engine_profile(engine, profile, config):
+    """
+    One line naming the active profile and what a fresh connection got, for
+    the startup log
+    """
+    settings, problems = check_engine_profile(engine, profile, config)
+    url = engine.url.render_as_string(hide_password=True)
+    line = f"{profile} engine profile on {url}: {', '.join(f'{name}={value}' for name, value in settings.items())}"
+    if problems:
+        line += f" (not applied: {'; '.join(problems)})"
+    return line
@@ -0,0 +1,30 @@
+"""
+Gunicorn settings, read automatically when gunicorn starts in this directory
+"""
+import os
+import tempfile
+
+# Workers add up their /metrics totals through this directory (see metrics.py)
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'farmers-metrics'))
+
+
+def on_starting(server):
+    # Totals left by a previous run would otherwise be added to this one
+    from metrics import clear_directory
+    clear_directory(os.environ['METRICS_DIR'])
+
+
+def post_worker_init(worker):
+    # Confirms at startup which engine profile each worker runs with
+    from app import describe_database
+    try:
+        worker.log.info(describe_database())
+    except Exception:
+        # Without a database the worker still starts, and answers with errors until it is back
+        worker.log.exception('Could not connect to the database to check the engine profile')
+
+
+def worker_exit(server, worker):
+    # Save what the worker counted since its last flush
+    from app import metrics_registry
+    metrics_registry.flush()
@@ -0,0 +1,52 @@
+"""
+Helpers for measuring what a request costs
+"""
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """
+    Record the SQL statements executed on an engine while the block runs:
+
+        with QueryCounter(db.engine) as queries:
+            client.get('/forum')
+        assert queries.count <= 4, queries.statements
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+def assert_max_queries(engine, limit):
+    """
+    Context manager that fails with the offending statements when the block
+    runs more than `limit` SQL statements
+    """
+    return _MaxQueries(engine, limit)
+
+
+class _MaxQueries(QueryCounter):
+    def __init__(self, engine, limit):
+        super().__init__(engine)
+        self.limit = limit
+
+    def __exit__(self, exc_type, *exc_info):
+        super().__exit__(exc_type, *exc_info)
+        if exc_type is None and self.count > self.limit:
+            listing = '\n'.join(f'  {statement}' for statement in self.statements)
+            raise AssertionError(f'Expected at most {self.limit} queries, got {self.count}:\n{listing}')
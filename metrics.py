@@ -0,0 +1,220 @@
+"""
+Counters and histograms rendered in the Prometheus text format.
+
+Each gunicorn worker keeps its own totals in memory. When a directory is
+configured (METRICS_DIR), every worker writes its cumulative totals to
+worker-<pid>-<id>.json there at most every `flush_interval` seconds, and
+/metrics adds up the files of all workers, so a scrape sees the whole server
+whichever worker answers it. The random id is new for every process, so a
+worker that gets a recycled pid never writes over an exited worker's file.
+Files of exited workers are kept so totals never go down; clear_directory()
+empties the directory when the server restarts (gunicorn.conf.py calls it).
+"""
+import json
+import math
+import os
+import threading
+import time
+import uuid
+
+# Request and query latencies in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, registry, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = registry._lock
+        self._values = {}
+        registry.metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[label]) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        return {json.dumps(key): value for key, value in self._values.items()}
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def render(self, samples):
+        for key, value in samples.items():
+            yield f'{self.name}{_labels(self.labels, json.loads(key))} {_number(value)}'
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, registry, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = registry._lock
+        self._values = {}
+        registry.metrics.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[label]) for label in self.labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket plus +Inf, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def snapshot(self):
+        return {json.dumps(key): list(counts) for key, counts in self._values.items()}
+
+    @staticmethod
+    def merge(total, counts):
+        if total is None:
+            return list(counts)
+        return [a + b for a, b in zip(total, counts)]
+
+    def render(self, samples):
+        for key, counts in samples.items():
+            values = json.loads(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _labels(self.labels + ('le',), values + [_number(bound)])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labels, values)} {_number(counts[-1])}'
+            yield f'{self.name}_count{_labels(self.labels, values)} {cumulative}'
+
+
+class MetricsRegistry:
+    """
+    The metrics of one process, and optionally the directory shared with the
+    other workers:
+
+        registry = MetricsRegistry('/tmp/farmers-metrics')
+        requests = Counter(registry, 'http_requests_total', 'Requests served', ['route'])
+    """
+
+    def __init__(self, directory=None, flush_interval=5):
+        self.directory = directory or None
+        self.flush_interval = flush_interval
+        self.metrics = []
+        self._lock = threading.Lock()
+        self._flushed_at = 0
+        self._pid = None
+        self._filename = None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def snapshot(self):
+        with self._lock:
+            return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def flush(self):
+        """
+        Write this worker's totals to the shared directory
+        """
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, self._worker_filename())
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        # Readers never see a half-written file
+        os.replace(f'{path}.tmp', path)
+        self._flushed_at = time.monotonic()
+
+    def _worker_filename(self):
+        # Checked on every flush: a registry created before gunicorn forks is
+        # shared by every worker, and each of them needs a file of its own
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._filename = f'worker-{pid}-{uuid.uuid4().hex[:12]}.json'
+        return self._filename
+
+    def maybe_flush(self):
+        """
+        flush() if the last one is older than flush_interval; cheap enough to
+        call after every request
+        """
+        if self.directory and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def collect(self):
+        """
+        Totals of every worker, {metric name: {label key: value}}
+        """
+        if not self.directory:
+            return self.snapshot()
+
+        self.flush()
+        totals = {metric.name: {} for metric in self.metrics}
+        merges = {metric.name: metric.merge for metric in self.metrics}
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, samples in snapshot.items():
+                if name not in totals:
+                    continue
+                for key, value in samples.items():
+                    totals[name][key] = merges[name](totals[name].get(key), value)
+        return totals
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format
+        """
+        totals = self.collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.render(dict(sorted(totals.get(metric.name, {}).items()))))
+        return '\n'.join(lines) + '\n'
+
+
+def clear_directory(directory):
+    """
+    Remove every worker's file from `directory`, before a new server starts
+    """
+    try:
+        filenames = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for filename in filenames:
+        if filename.startswith('worker-'):
+            try:
+                os.remove(os.path.join(directory, filename))
+            except FileNotFoundError:
+                pass
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return '+Inf' if value == math.inf else repr(value)
@@ -0,0 +1,46 @@
+"""Add indexes for hot query paths
+
+Revision ID: 09f4e75a0e1f
+Revises: 830e5995f4bd
+Create Date: 2026-10-17 11:02:17.540931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '09f4e75a0e1f'
+down_revision = '830e5995f4bd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_user_status_date', ['user_id', 'status', 'order_date'], unique=False)
+
+    with op.batch_alter_table('forum_post', schema=None) as batch_op:
+        batch_op.create_index('ix_forum_post_date_posted', ['date_posted'], unique=False)
+        batch_op.create_index('ix_forum_post_category_date', ['category', 'date_posted'], unique=False)
+
+    with op.batch_alter_table('forum_comment', schema=None) as batch_op:
+        batch_op.create_index('ix_forum_comment_post_date', ['post_id', 'date_posted'], unique=False)
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_in_stock_category', ['in_stock', 'category'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_in_stock_category')
+
+    with op.batch_alter_table('forum_comment', schema=None) as batch_op:
+        batch_op.drop_index('ix_forum_comment_post_date')
+
+    with op.batch_alter_table('forum_post', schema=None) as batch_op:
+        batch_op.drop_index('ix_forum_post_category_date')
+        batch_op.drop_index('ix_forum_post_date_posted')
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_user_status_date')
@@ -0,0 +1,29 @@
+"""Add forum full-text search index
+
+Revision ID: 5b2e8d1f4a73
+Revises: 713b80c40ca8
+Create Date: 2026-10-17 14:05:12.384511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search import create_search_index, drop_search_index, rebuild_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e8d1f4a73'
+down_revision = '713b80c40ca8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 table and triggers on SQLite, GIN expression indexes on PostgreSQL
+    connection = op.get_bind()
+    create_search_index(connection, ['forum'])
+    rebuild_search_index(connection, ['forum'])
+
+
+def downgrade():
+    drop_search_index(op.get_bind(), ['forum'])
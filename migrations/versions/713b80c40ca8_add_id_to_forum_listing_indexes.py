@@ -0,0 +1,40 @@
+"""Add id to forum listing indexes for keyset pagination
+
+Revision ID: 713b80c40ca8
+Revises: c19945fa4916
+Create Date: 2026-10-17 12:31:44.117052
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '713b80c40ca8'
+down_revision = 'c19945fa4916'
+branch_labels = None
+depends_on = None
+
+# index name -> leading columns; id is appended so (sort value, id) cursors are one range scan
+INDEXES = {
+    'ix_forum_post_date_posted': ['date_posted'],
+    'ix_forum_post_category_date': ['category', 'date_posted'],
+    'ix_forum_post_last_activity': ['last_activity_at'],
+    'ix_forum_post_category_activity': ['category', 'last_activity_at'],
+    'ix_forum_post_comment_count': ['comment_count'],
+    'ix_forum_post_category_comments': ['category', 'comment_count'],
+}
+
+
+def upgrade():
+    with op.batch_alter_table('forum_post', schema=None) as batch_op:
+        for name, columns in INDEXES.items():
+            batch_op.drop_index(name)
+            batch_op.create_index(name, columns + ['id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('forum_post', schema=None) as batch_op:
+        for name, columns in INDEXES.items():
+            batch_op.drop_index(name)
+            batch_op.create_index(name, columns, unique=False)
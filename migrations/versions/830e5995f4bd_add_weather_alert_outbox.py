@@ -0,0 +1,47 @@
+"""Add weather alert outbox and subscriber index
+
+Revision ID: 830e5995f4bd
+Revises: c42ef75c9634
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '830e5995f4bd'
+down_revision = 'c42ef75c9634'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('weather_alert',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('location', sa.String(length=200), nullable=False),
+    sa.Column('kind', sa.String(length=30), nullable=False),
+    sa.Column('message', sa.String(length=300), nullable=False),
+    sa.Column('alert_date', sa.Date(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'kind', 'alert_date', name='uq_weather_alert_user_kind_date')
+    )
+    with op.batch_alter_table('weather_alert', schema=None) as batch_op:
+        batch_op.create_index('ix_weather_alert_sent_at', ['sent_at'], unique=False)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_subscription_location', ['subscription', 'farm_location', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_subscription_location')
+
+    with op.batch_alter_table('weather_alert', schema=None) as batch_op:
+        batch_op.drop_index('ix_weather_alert_sent_at')
+
+    op.drop_table('weather_alert')
@@ -0,0 +1,45 @@
+"""Add product catalog indexes and full-text search
+
+Revision ID: a8d34c7e91b2
+Revises: 5b2e8d1f4a73
+Create Date: 2026-10-17 15:22:40.902118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search import create_search_index, drop_search_index, rebuild_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d34c7e91b2'
+down_revision = '5b2e8d1f4a73'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_product_in_stock_category_price': ['in_stock', 'category', 'price'],
+    'ix_product_in_stock_category_name': ['in_stock', 'category', 'name'],
+    'ix_product_in_stock_price': ['in_stock', 'price'],
+    'ix_product_in_stock_name': ['in_stock', 'name'],
+}
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_in_stock_category')
+        for name, columns in INDEXES.items():
+            batch_op.create_index(name, columns, unique=False)
+
+    connection = op.get_bind()
+    create_search_index(connection, ['product'])
+    rebuild_search_index(connection, ['product'])
+
+
+def downgrade():
+    drop_search_index(op.get_bind(), ['product'])
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        for name in INDEXES:
+            batch_op.drop_index(name)
+        batch_op.create_index('ix_product_in_stock_category', ['in_stock', 'category'], unique=False)
@@ -0,0 +1,51 @@
+"""Add comment_count and last_activity_at to forum_post
+
+Revision ID: c19945fa4916
+Revises: 09f4e75a0e1f
+Create Date: 2026-10-17 11:48:05.902717
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c19945fa4916'
+down_revision = '09f4e75a0e1f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('forum_post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('last_activity_at', sa.DateTime(), nullable=True))
+
+    # Backfill from the existing comments
+    op.execute("""
+        UPDATE forum_post SET
+            comment_count = (
+                SELECT COUNT(*) FROM forum_comment WHERE forum_comment.post_id = forum_post.id
+            ),
+            last_activity_at = COALESCE(
+                (SELECT MAX(forum_comment.date_posted) FROM forum_comment
+                 WHERE forum_comment.post_id = forum_post.id),
+                forum_post.date_posted
+            )
+    """)
+
+    with op.batch_alter_table('forum_post', schema=None) as batch_op:
+        batch_op.create_index('ix_forum_post_last_activity', ['last_activity_at'], unique=False)
+        batch_op.create_index('ix_forum_post_category_activity', ['category', 'last_activity_at'], unique=False)
+        batch_op.create_index('ix_forum_post_comment_count', ['comment_count'], unique=False)
+        batch_op.create_index('ix_forum_post_category_comments', ['category', 'comment_count'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('forum_post', schema=None) as batch_op:
+        batch_op.drop_index('ix_forum_post_category_comments')
+        batch_op.drop_index('ix_forum_post_comment_count')
+        batch_op.drop_index('ix_forum_post_category_activity')
+        batch_op.drop_index('ix_forum_post_last_activity')
+        batch_op.drop_column('last_activity_at')
+        batch_op.drop_column('comment_count')
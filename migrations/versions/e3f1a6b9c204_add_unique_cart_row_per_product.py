@@ -0,0 +1,47 @@
+"""Add unique cart row per user and product
+
+Revision ID: e3f1a6b9c204
+Revises: a8d34c7e91b2
+Create Date: 2026-10-17 16:10:05.671240
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3f1a6b9c204'
+down_revision = 'a8d34c7e91b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Merge duplicate cart rows left by the old read-then-write add_to_cart
+    # into the oldest row before the unique index can be built
+    op.execute("""
+        UPDATE "order" SET quantity = (
+            SELECT SUM(duplicate.quantity) FROM "order" AS duplicate
+            WHERE duplicate.user_id = "order".user_id
+              AND duplicate.product_id = "order".product_id
+              AND duplicate.status = 'Cart'
+        )
+        WHERE status = 'Cart' AND id IN (
+            SELECT MIN(id) FROM "order" WHERE status = 'Cart'
+            GROUP BY user_id, product_id HAVING COUNT(*) > 1
+        )
+    """)
+    op.execute("""
+        DELETE FROM "order" WHERE status = 'Cart' AND id NOT IN (
+            SELECT MIN(id) FROM "order" WHERE status = 'Cart' GROUP BY user_id, product_id
+        )
+    """)
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('uq_order_user_product_cart', ['user_id', 'product_id', 'status'], unique=True,
+                              sqlite_where=sa.text("status = 'Cart'"), postgresql_where=sa.text("status = 'Cart'"))
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('uq_order_user_product_cart')
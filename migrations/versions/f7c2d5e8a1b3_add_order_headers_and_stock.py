@@ -0,0 +1,123 @@
+"""Add order headers and product stock
+
+Revision ID: f7c2d5e8a1b3
+Revises: e3f1a6b9c204
+Create Date: 2026-10-17 17:03:48.215907
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c2d5e8a1b3'
+down_revision = 'e3f1a6b9c204'
+branch_labels = None
+depends_on = None
+
+# The old checkout stamped each line with its own utcnow() as it went, so the
+# lines of one checkout are milliseconds apart; a longer gap starts a new one
+CHECKOUT_GAP = timedelta(seconds=5)
+
+order_table = sa.table('order',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('order_date', sa.DateTime),
+    sa.column('status', sa.String),
+    sa.column('quantity', sa.Integer),
+    sa.column('unit_price', sa.Float),
+    sa.column('header_id', sa.Integer),
+)
+
+# A full Table, so inserts can return the new header's primary key
+order_header_table = sa.Table('order_header', sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('user_id', sa.Integer),
+    sa.Column('created_at', sa.DateTime),
+    sa.Column('status', sa.String),
+    sa.Column('item_count', sa.Integer),
+    sa.Column('total', sa.Float),
+)
+
+
+def backfill_order_headers(connection):
+    """
+    Give every past order line a header, one per user and checkout
+    """
+    lines = connection.execute(
+        sa.select(order_table.c.id, order_table.c.user_id, order_table.c.order_date,
+                  order_table.c.quantity, order_table.c.unit_price)
+        .where(order_table.c.status != 'Cart', order_table.c.order_date.isnot(None))
+        .order_by(order_table.c.user_id, order_table.c.order_date, order_table.c.id)
+    ).all()
+
+    checkouts = []
+    for line in lines:
+        current = checkouts[-1] if checkouts else None
+        if current is None or current[-1].user_id != line.user_id or \
+                line.order_date - current[-1].order_date > CHECKOUT_GAP:
+            checkouts.append([line])
+        else:
+            current.append(line)
+
+    for checkout in checkouts:
+        header_id = connection.execute(order_header_table.insert().values(
+            user_id=checkout[0].user_id,
+            created_at=checkout[0].order_date,
+            status='Placed',
+            item_count=sum(line.quantity for line in checkout),
+            total=sum(line.quantity * (line.unit_price or 0) for line in checkout),
+        )).inserted_primary_key[0]
+        connection.execute(order_table.update()
+                           .where(order_table.c.id.in_([line.id for line in checkout]))
+                           .values(header_id=header_id))
+
+
+def upgrade():
+    op.create_table('order_header',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('item_count', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('order_header', schema=None) as batch_op:
+        batch_op.create_index('ix_order_header_user_created', ['user_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('header_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('unit_price', sa.Float(), nullable=True))
+        batch_op.create_index('ix_order_header_id', ['header_id'], unique=False)
+        batch_op.create_foreign_key('fk_order_header_id_order_header', 'order_header', ['header_id'], ['id'])
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stock_quantity', sa.Integer(), nullable=True))
+
+    # Past checkouts become one header each, priced at today's product prices
+    # since the price paid was never stored
+    op.execute("""
+        UPDATE "order" SET unit_price = (SELECT price FROM product WHERE product.id = "order".product_id)
+        WHERE status != 'Cart' AND order_date IS NOT NULL
+    """)
+    backfill_order_headers(op.get_bind())
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('stock_quantity')
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_order_header_id_order_header', type_='foreignkey')
+        batch_op.drop_index('ix_order_header_id')
+        batch_op.drop_column('unit_price')
+        batch_op.drop_column('header_id')
+
+    with op.batch_alter_table('order_header', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_header_user_created')
+
+    op.drop_table('order_header')
@@ -0,0 +1,142 @@
+"""
+Password hashing and login throttling.
+
+Hashes use a Werkzeug method string such as "scrypt:32768:8:1" or
+"pbkdf2:sha256:600000", so the work factor is configuration
+(PASSWORD_HASH_METHOD) and `flask --app app tune-password-hash` picks one that
+costs about a chosen number of milliseconds on this machine. Hashes made with
+an older method, including the unsalted-KDF "sha256$..." hashes that early
+accounts have, still verify and are replaced on the next successful login.
+"""
+import functools
+import hashlib
+import hmac
+import statistics
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+# Single-round digests that Werkzeug before 3.0 could write; 3.0 no longer reads them
+LEGACY_METHODS = {'md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512'}
+
+# scrypt needs 128 * n * r bytes, so stop tuning before a login needs this much memory
+SCRYPT_MAX_MEMORY = 128 * 1024 * 1024
+
+
+def hash_password(password, method=DEFAULT_METHOD):
+    return generate_password_hash(password, method=method)
+
+
+def verify_password(stored, password):
+    """
+    True if `password` matches the stored hash, whichever method made it
+    """
+    method = stored.split('$', 1)[0]
+    if method in LEGACY_METHODS:
+        try:
+            _, salt, expected = stored.split('$', 2)
+        except ValueError:
+            return False
+        if salt:
+            actual = hmac.new(salt.encode('utf-8'), password.encode('utf-8'), method).hexdigest()
+        else:
+            actual = hashlib.new(method, password.encode('utf-8')).hexdigest()
+        return hmac.compare_digest(actual, expected)
+    try:
+        return check_password_hash(stored, password)
+    except ValueError:
+        return False
+
+
+def needs_rehash(stored, method=DEFAULT_METHOD):
+    """
+    True if the stored hash was not made with `method` and its parameters
+    """
+    return stored.split('$', 1)[0] != _full_method(method)
+
+
+@functools.lru_cache(maxsize=None)
+def _full_method(method):
+    # "pbkdf2" is written out as "pbkdf2:sha256:600000"; hashing once shows exactly what is stored
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def time_method(method, rounds=5):
+    """
+    Median seconds to hash one password with `method`
+    """
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        generate_password_hash('correct horse battery staple', method=method)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def tune_method(kind, target_seconds, rounds=5):
+    """
+    The strongest `kind` ('scrypt' or 'pbkdf2') method that hashes within
+    `target_seconds` here. Returns (method, seconds per hash).
+    """
+    if kind == 'pbkdf2':
+        # Cost grows linearly with iterations
+        probe = 100000
+        iterations = int(probe * target_seconds / time_method(f'pbkdf2:sha256:{probe}', rounds))
+        method = f'pbkdf2:sha256:{max(10000, iterations // 10000 * 10000)}'
+        return method, time_method(method, rounds)
+
+    if kind != 'scrypt':
+        raise ValueError(f'Unknown KDF: {kind}')
+    # Cost doubles with n, so take the largest power of two that fits
+    method = 'scrypt:16384:8:1'
+    seconds = time_method(method, rounds)
+    n = 32768
+    while 128 * n * 8 <= SCRYPT_MAX_MEMORY:
+        candidate = f'scrypt:{n}:8:1'
+        candidate_seconds = time_method(candidate, rounds)
+        if candidate_seconds > target_seconds:
+            break
+        method, seconds = candidate, candidate_seconds
+        n *= 2
+    return method, seconds
+
+
+class LoginThrottle:
+    """
+    Counts failed logins per client address, and per username from that
+    address, in the shared cache in fixed windows of `window` seconds. Once
+    either count reaches its limit, blocked() is true for that address until
+    the window ends, so guessing stops costing a password hash per attempt.
+    The username count is never global: failures from one address must not
+    lock the account's owner out everywhere else.
+
+    Out of scope: guessing one account from many rotating addresses. Any
+    limit on an account's total failures would let the same attacker lock
+    its owner out, so each of those guesses is only slowed by the cost of
+    PASSWORD_HASH_METHOD. A proxy or WAF in front of the app has to rate
+    limit distributed attacks.
+    """
+
+    def __init__(self, cache, ip_limit=20, username_limit=5, window=900):
+        self.cache = cache
+        self.ip_limit = ip_limit
+        self.username_limit = username_limit
+        self.window = window
+
+    def _keys(self, ip, username):
+        return f'login-failures:ip:{ip}', f'login-failures:user:{ip}:{username.strip().lower()}'
+
+    def blocked(self, ip, username):
+        ip_key, user_key = self._keys(ip, username)
+        return (self.cache.get(ip_key) or 0) >= self.ip_limit or \
+            (self.cache.get(user_key) or 0) >= self.username_limit
+
+    def record_failure(self, ip, username):
+        for key in self._keys(ip, username):
+            self.cache.incr(key, ttl=self.window)
+
+    def record_success(self, ip, username):
+        # The address keeps its count: one right password should not unlock guessing at other accounts
+        self.cache.delete(self._keys(ip, username)[1])
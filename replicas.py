@@ -0,0 +1,99 @@
+"""
+Read-replica routing for db.session.
+
+Replica databases are extra Flask-SQLAlchemy binds named replica1, replica2,
+... When a view has switched its session to replica reads (app.py does this
+for read-only views), plain SELECTs go to one replica, chosen once per request
+so every read sees the same snapshot. Everything else goes to the primary
+and counts as a write: INSERT/UPDATE/DELETE whether built or written as
+text(), SELECT ... FOR UPDATE, ORM flushes and any other statement that is
+not a plain SELECT. Every statement after the first write in the session goes
+to the primary too, so a request always reads its own writes. Sessions that
+never switch to replica reads, like CLI commands and mutating views, only use
+the primary.
+
+`wrote_primary(session)` tells the app that a request changed something, so
+it can keep that client on the primary while the replicas catch up.
+"""
+import random
+import sqlite3
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.elements import TextClause
+
+REPLICA_BIND_PREFIX = 'replica'
+
+
+def replica_binds(urls, options_for):
+    """
+    SQLALCHEMY_BINDS entries for the replica URLs; `options_for(url)` returns
+    the engine options for each
+    """
+    return {f'{REPLICA_BIND_PREFIX}{n}': {'url': url, **options_for(url)} for n, url in enumerate(urls, 1)}
+
+
+def replica_engines(db):
+    return [engine for key, engine in sorted(db.engines.items(), key=lambda item: item[0] or '')
+            if key and key.startswith(REPLICA_BIND_PREFIX)]
+
+
+class RoutingSession(Session):
+    """
+    db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+    """
+
+    def use_replica(self):
+        """
+        Send this session's reads to a replica until it writes
+        """
+        self.info['replica_reads'] = True
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or _locks_rows(clause) or not _is_read(clause):
+                self.info['primary_writes'] = True
+            elif self.info.get('replica_reads') and not self.info.get('primary_writes'):
+                replica = self._replica()
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica(self):
+        if 'replica_engine' not in self.info:
+            engines = replica_engines(self._db)
+            self.info['replica_engine'] = random.choice(engines) if engines else None
+        return self.info['replica_engine']
+
+
+def wrote_primary(session):
+    """
+    True if the session sent a write to the primary
+    """
+    return session.info.get('primary_writes', False)
+
+
+def _locks_rows(clause):
+    return getattr(clause, '_for_update_arg', None) is not None
+
+
+def _is_read(clause):
+    # No clause: session.connection() for raw reads such as the search queries
+    if clause is None or getattr(clause, 'is_select', False):
+        return True
+    return isinstance(clause, TextClause) and clause.text.lstrip()[:6].upper() == 'SELECT'
+
+
+def copy_sqlite_database(source_url, target_url):
+    """
+    Copy one SQLite database file over another with SQLite's online backup,
+    which is how a replica is refreshed when testing locally
+    """
+    source_path, target_path = make_url(source_url).database, make_url(target_url).database
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
@@ -0,0 +1,324 @@
+"""
+Full-text search over forum posts and comments, and over the product catalog.
+
+On SQLite the text lives in FTS5 tables that triggers keep in sync.
+`forum_search` covers forum_post and forum_comment: posts use rowid id*2 and
+comments id*2+1, so a trigger can update one document by rowid.
+`product_search` indexes the product table in place. On PostgreSQL,
+expression GIN indexes over to_tsvector() are used instead, and those stay in
+sync by themselves.
+"""
+from markupsafe import Markup, escape
+from sqlalchemy import Float, Integer, text
+
+# Only the newest this many matching posts, and as many matching comments, are
+# ranked, so a word that appears in most posts still costs two short index
+# ranges instead of scoring every match. Posts and comments get a window each:
+# comments outnumber posts, and one shared window would fill up with comments.
+RANK_CANDIDATES = 1000
+
+# Snippet markers that cannot appear in user text; swapped for <mark> after escaping
+_HIT_START = '\x02'
+_HIT_END = '\x03'
+
+SEARCH_INDEXES = ('forum', 'product')
+
+# SQLite tables owned by this module: the FTS5 tables and their shadow tables
+SEARCH_TABLES = {'forum_search', 'forum_search_data', 'forum_search_idx',
+                 'forum_search_content', 'forum_search_docsize', 'forum_search_config',
+                 'product_search', 'product_search_data', 'product_search_idx',
+                 'product_search_docsize', 'product_search_config'}
+
+SQLITE_DDL = {
+    'forum': [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS forum_search USING fts5(
+            title, body, post_id UNINDEXED, tokenize = 'porter unicode61'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS forum_post_search_insert AFTER INSERT ON forum_post BEGIN
+            INSERT INTO forum_search (rowid, title, body, post_id)
+            VALUES (new.id * 2, new.title, new.content, new.id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS forum_post_search_update AFTER UPDATE OF title, content ON forum_post BEGIN
+            DELETE FROM forum_search WHERE rowid = old.id * 2;
+            INSERT INTO forum_search (rowid, title, body, post_id)
+            VALUES (new.id * 2, new.title, new.content, new.id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS forum_post_search_delete AFTER DELETE ON forum_post BEGIN
+            DELETE FROM forum_search WHERE rowid = old.id * 2;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS forum_comment_search_insert AFTER INSERT ON forum_comment BEGIN
+            INSERT INTO forum_search (rowid, title, body, post_id)
+            VALUES (new.id * 2 + 1, '', new.content, new.post_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS forum_comment_search_update AFTER UPDATE OF content ON forum_comment BEGIN
+            DELETE FROM forum_search WHERE rowid = old.id * 2 + 1;
+            INSERT INTO forum_search (rowid, title, body, post_id)
+            VALUES (new.id * 2 + 1, '', new.content, new.post_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS forum_comment_search_delete AFTER DELETE ON forum_comment BEGIN
+            DELETE FROM forum_search WHERE rowid = old.id * 2 + 1;
+        END
+        """,
+    ],
+    # External-content table: the text stays in product and only the index is stored
+    'product': [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5(
+            name, description, content = 'product', content_rowid = 'id',
+            tokenize = 'porter unicode61'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS product_search_insert AFTER INSERT ON product BEGIN
+            INSERT INTO product_search (rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS product_search_update AFTER UPDATE OF name, description ON product BEGIN
+            INSERT INTO product_search (product_search, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO product_search (rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS product_search_delete AFTER DELETE ON product BEGIN
+            INSERT INTO product_search (product_search, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+        """,
+    ],
+}
+
+SQLITE_DROP = {
+    'forum': [
+        'DROP TRIGGER IF EXISTS forum_comment_search_delete',
+        'DROP TRIGGER IF EXISTS forum_comment_search_update',
+        'DROP TRIGGER IF EXISTS forum_comment_search_insert',
+        'DROP TRIGGER IF EXISTS forum_post_search_delete',
+        'DROP TRIGGER IF EXISTS forum_post_search_update',
+        'DROP TRIGGER IF EXISTS forum_post_search_insert',
+        'DROP TABLE IF EXISTS forum_search',
+    ],
+    'product': [
+        'DROP TRIGGER IF EXISTS product_search_delete',
+        'DROP TRIGGER IF EXISTS product_search_update',
+        'DROP TRIGGER IF EXISTS product_search_insert',
+        'DROP TABLE IF EXISTS product_search',
+    ],
+}
+
+SQLITE_REBUILD = {
+    'forum': [
+        'DELETE FROM forum_search',
+        """
+        INSERT INTO forum_search (rowid, title, body, post_id)
+        SELECT id * 2, title, content, id FROM forum_post
+        """,
+        """
+        INSERT INTO forum_search (rowid, title, body, post_id)
+        SELECT id * 2 + 1, '', content, post_id FROM forum_comment
+        """,
+        "INSERT INTO forum_search (forum_search) VALUES ('optimize')",
+    ],
+    'product': [
+        "INSERT INTO product_search (product_search) VALUES ('rebuild')",
+        "INSERT INTO product_search (product_search) VALUES ('optimize')",
+    ],
+}
+
+POSTGRES_DDL = {
+    'forum': [
+        """
+        CREATE INDEX IF NOT EXISTS ix_forum_post_search ON forum_post
+        USING gin (to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, '')))
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS ix_forum_comment_search ON forum_comment
+        USING gin (to_tsvector('english', coalesce(content, '')))
+        """,
+    ],
+    'product': [
+        """
+        CREATE INDEX IF NOT EXISTS ix_product_search ON product
+        USING gin (to_tsvector('english', name || ' ' || description))
+        """,
+    ],
+}
+
+POSTGRES_DROP = {
+    'forum': [
+        'DROP INDEX IF EXISTS ix_forum_comment_search',
+        'DROP INDEX IF EXISTS ix_forum_post_search',
+    ],
+    'product': [
+        'DROP INDEX IF EXISTS ix_product_search',
+    ],
+}
+
+POSTGRES_REBUILD = {
+    'forum': [
+        'REINDEX INDEX ix_forum_post_search',
+        'REINDEX INDEX ix_forum_comment_search',
+    ],
+    'product': [
+        'REINDEX INDEX ix_product_search',
+    ],
+}
+
+SQLITE_SEARCH = text(f"""
+    SELECT post_id, snippet(forum_search, 1, '{_HIT_START}', '{_HIT_END}', '…', 16) AS snippet
+    FROM forum_search
+    WHERE forum_search MATCH :query
+      AND rowid >= CASE rowid % 2
+          WHEN 0 THEN coalesce((
+              SELECT min(rowid) FROM (
+                  SELECT rowid FROM forum_search WHERE forum_search MATCH :query AND rowid % 2 = 0
+                  ORDER BY rowid DESC LIMIT :candidates
+              )
+          ), 0)
+          ELSE coalesce((
+              SELECT min(rowid) FROM (
+                  SELECT rowid FROM forum_search WHERE forum_search MATCH :query AND rowid % 2 = 1
+                  ORDER BY rowid DESC LIMIT :candidates
+              )
+          ), 0)
+      END
+    ORDER BY bm25(forum_search, 5.0, 1.0)
+    LIMIT :limit
+""")
+
+POSTGRES_SEARCH = text(f"""
+    WITH query AS (SELECT websearch_to_tsquery('english', :query) AS q),
+    hits AS (
+        SELECT p.id AS post_id, p.content AS body,
+               ts_rank(to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.content, '')), query.q) * 2 AS rank
+        FROM forum_post p, query
+        WHERE to_tsvector('english', coalesce(p.title, '') || ' ' || coalesce(p.content, '')) @@ query.q
+        UNION ALL
+        SELECT c.post_id, c.content AS body,
+               ts_rank(to_tsvector('english', coalesce(c.content, '')), query.q) AS rank
+        FROM forum_comment c, query
+        WHERE to_tsvector('english', coalesce(c.content, '')) @@ query.q
+    ),
+    top AS (SELECT * FROM hits ORDER BY rank DESC LIMIT :limit)
+    SELECT top.post_id,
+           ts_headline('english', top.body, query.q,
+                       'StartSel={_HIT_START}, StopSel={_HIT_END}, MaxWords=30, MinWords=10') AS snippet
+    FROM top, query
+    ORDER BY top.rank DESC
+""")
+
+
+def _run(connection, statements, indexes):
+    by_index = statements['postgresql' if connection.dialect.name == 'postgresql' else 'sqlite']
+    for index in indexes:
+        for statement in by_index[index]:
+            connection.exec_driver_sql(statement)
+
+
+def create_search_index(connection, indexes=SEARCH_INDEXES):
+    """
+    Create the search tables/indexes and triggers if they do not exist yet
+    """
+    _run(connection, {'sqlite': SQLITE_DDL, 'postgresql': POSTGRES_DDL}, indexes)
+
+
+def drop_search_index(connection, indexes=SEARCH_INDEXES):
+    """
+    Drop everything create_search_index() made
+    """
+    _run(connection, {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}, indexes)
+
+
+def rebuild_search_index(connection, indexes=SEARCH_INDEXES):
+    """
+    Re-index every post, comment and product from scratch
+    """
+    create_search_index(connection, indexes)
+    _run(connection, {'sqlite': SQLITE_REBUILD, 'postgresql': POSTGRES_REBUILD}, indexes)
+
+
+def _match_query(query):
+    """
+    Words of a free-text query, or [] if there is nothing to search for
+    """
+    return [word for word in query.split() if any(char.isalnum() for char in word)]
+
+
+def _fts5_query(words):
+    # Quote every word so user input is never read as FTS5 syntax; the last
+    # word is a prefix so partly typed words still match
+    return ' '.join('"%s"' % word.replace('"', '""') for word in words) + '*'
+
+
+def search_forum(connection, query, limit=20):
+    """
+    Search posts and comments. Returns up to `limit` (post_id, snippet) pairs,
+    best match first and one per post; snippets are safe HTML with hits in <mark>.
+    """
+    words = _match_query(query)
+    if not words:
+        return []
+
+    if connection.dialect.name == 'postgresql':
+        # websearch_to_tsquery accepts free text safely
+        statement, query = POSTGRES_SEARCH, ' '.join(words)
+    else:
+        statement, query = SQLITE_SEARCH, _fts5_query(words)
+
+    # Several comments of one post can match, so over-fetch and keep the best per post
+    results = {}
+    params = {'query': query, 'limit': limit * 5, 'candidates': RANK_CANDIDATES}
+    for post_id, snippet in connection.execute(statement, params):
+        if post_id not in results:
+            results[post_id] = highlight(snippet)
+            if len(results) == limit:
+                break
+    return list(results.items())
+
+
+def product_matches(dialect_name, query):
+    """
+    Subquery of (product_id, rank) for products whose name or description
+    matches `query`, lower rank first, or None if the query has no words
+    """
+    words = _match_query(query)
+    if not words:
+        return None
+
+    if dialect_name == 'postgresql':
+        statement = text("""
+            SELECT id AS product_id,
+                   -ts_rank(to_tsvector('english', name || ' ' || description), q) AS rank
+            FROM product, websearch_to_tsquery('english', :product_query) AS q
+            WHERE to_tsvector('english', name || ' ' || description) @@ q
+        """).bindparams(product_query=' '.join(words))
+    else:
+        statement = text("""
+            SELECT rowid AS product_id, bm25(product_search, 5.0, 1.0) AS rank
+            FROM product_search WHERE product_search MATCH :product_query
+        """).bindparams(product_query=_fts5_query(words))
+    return statement.columns(product_id=Integer, rank=Float).subquery('product_matches')
+
+
+def highlight(snippet):
+    """
+    Escape a snippet and turn the hit markers into <mark> tags
+    """
+    escaped = str(escape(snippet or ''))
+    return Markup(escaped.replace(_HIT_START, '<mark>').replace(_HIT_END, '</mark>'))
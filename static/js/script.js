@@ -51,4 +51,131 @@ document.addEventListener("DOMContentLoaded", function () {
       iconEl.className = `fas ${weatherIcons[condition]} fa-2x`;
     }
   });
+
+  // Cart: update the page in place through the JSON cart API. The links
+  // still work as plain GET fallbacks when JavaScript is unavailable.
+  document.querySelectorAll("[data-add-to-cart]").forEach((button) => {
+    button.addEventListener("click", (event) => {
+      event.preventDefault();
+      cartRequest("POST", "/api/cart/items", {
+        product_id: Number(button.dataset.addToCart),
+      })
+        .then((cart) => {
+          updateCartCount(cart.item_count);
+          showMessage("Added to cart!", "success");
+        })
+        .catch((error) => showMessage(error.message, "danger"));
+    });
+  });
+
+  document.querySelectorAll("[data-cart-item]").forEach((row) => {
+    row.querySelectorAll("[data-cart-action]").forEach((link) => {
+      link.addEventListener("click", (event) => {
+        event.preventDefault();
+        const url = `/api/cart/items/${row.dataset.cartItem}`;
+        const quantity = Number(
+          row.querySelector('[data-cart-field="quantity"]').textContent
+        );
+        const action = link.dataset.cartAction;
+        const request =
+          action === "remove"
+            ? cartRequest("DELETE", url)
+            : cartRequest("PATCH", url, {
+                quantity: action === "increase" ? quantity + 1 : quantity - 1,
+              });
+        request
+          .then(renderCart)
+          .catch((error) => showMessage(error.message, "danger"));
+      });
+    });
+  });
 });
+
+// Send a cart API call with an Idempotency-Key, retrying once with the same
+// key if the network drops so the change is applied exactly once
+function cartRequest(method, url, body) {
+  const key =
+    window.crypto && crypto.randomUUID
+      ? crypto.randomUUID()
+      : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+  const send = () =>
+    fetch(url, {
+      method: method,
+      headers: {
+        "Content-Type": "application/json",
+        "Idempotency-Key": key,
+      },
+      body: body === undefined ? undefined : JSON.stringify(body),
+    });
+  return send()
+    .catch(() => send())
+    .then((response) =>
+      response.json().then((data) => {
+        if (!response.ok) {
+          throw new Error(data.error || "Could not update the cart");
+        }
+        return data;
+      })
+    );
+}
+
+function renderCart(cart) {
+  if (cart.items.length === 0) {
+    window.location.reload();
+    return;
+  }
+  const items = new Map(cart.items.map((item) => [String(item.id), item]));
+  document.querySelectorAll("[data-cart-item]").forEach((row) => {
+    const item = items.get(row.dataset.cartItem);
+    if (!item) {
+      row.remove();
+      return;
+    }
+    row.querySelector('[data-cart-field="quantity"]').textContent = item.quantity;
+    row.querySelector('[data-cart-field="line_total"]').textContent = formatINR(
+      item.line_total
+    );
+  });
+  document.querySelectorAll("[data-cart-total]").forEach((el) => {
+    el.textContent = formatINR(cart[el.dataset.cartTotal]);
+  });
+  updateCartCount(cart.item_count);
+}
+
+function updateCartCount(count) {
+  const badge = document.getElementById("cart-count");
+  if (badge) {
+    badge.textContent = count;
+    badge.classList.toggle("d-none", count === 0);
+  }
+}
+
+// Same output as the inr template filter
+function formatINR(value) {
+  const whole = Number.isInteger(value);
+  return (
+    "₹" +
+    value.toLocaleString("en-US", {
+      minimumFractionDigits: whole ? 0 : 2,
+      maximumFractionDigits: whole ? 0 : 2,
+    })
+  );
+}
+
+function showMessage(message, category) {
+  const container = document.getElementById("flash-messages");
+  if (!container) {
+    return;
+  }
+  const alert = document.createElement("div");
+  alert.className = `alert alert-${category} alert-dismissible fade show`;
+  alert.setAttribute("role", "alert");
+  alert.textContent = message;
+  const close = document.createElement("button");
+  close.type = "button";
+  close.className = "btn-close";
+  close.setAttribute("data-bs-dismiss", "alert");
+  alert.appendChild(close);
+  container.appendChild(alert);
+  setTimeout(() => bootstrap.Alert.getOrCreateInstance(alert).close(), 5000);
+}
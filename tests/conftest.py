@@ -0,0 +1,93 @@
+"""
+Shared fixtures.
+
+app.py reads its settings when it is imported, so the database, cache and
+weather API are pointed at throwaway local ones before the first import: a
+SQLite file in a temporary directory, the in-process memory cache and the fake
+OpenWeatherMap server from benchmarks.fake_weather.
+"""
+import itertools
+import os
+import tempfile
+
+import pytest
+
+from benchmarks.fake_weather import FakeWeatherServer
+
+TEST_DIR = tempfile.mkdtemp(prefix='farmers-tests-')
+# Slow enough that concurrent callers overlap while one fetch is in flight
+weather_server = FakeWeatherServer(('127.0.0.1', 0), latency=0.2).start()
+
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}",
+    'CACHE_URL': 'memory://?max_entries=4096',
+    'WEATHER_API_URL': weather_server.url,
+    'WEATHER_API_KEY': 'test',
+    # Cheap hashes; the tests are not about password cost
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+})
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+os.environ.pop('METRICS_DIR', None)
+
+import app as farmers  # noqa: E402
+
+_usernames = (f'tester{n}' for n in itertools.count(1))
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    farmers.create_tables()
+    yield farmers.db
+
+
+@pytest.fixture
+def weather_api():
+    weather_server.requests = 0
+    return weather_server
+
+
+@pytest.fixture
+def user():
+    """
+    A new user for each test, so carts and orders never leak between tests
+    """
+    username = next(_usernames)
+    with farmers.app.app_context():
+        user = farmers.User(username=username, email=f'{username}@example.com',
+                            password=farmers.hash_password('secret', farmers.app.config['PASSWORD_HASH_METHOD']))
+        farmers.db.session.add(user)
+        farmers.db.session.commit()
+        return {'id': user.id, 'username': username, 'password': 'secret'}
+
+
+def signed_in_client(user_id):
+    """
+    A test client with a session for `user_id`. Each of its requests runs in
+    its own app context, as in production, so nothing in `g` or the session's
+    identity map carries over between requests.
+    """
+    client = farmers.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+@pytest.fixture
+def client(user):
+    return signed_in_client(user['id'])
+
+
+@pytest.fixture
+def shopper(user, client):
+    """
+    A signed-in client whose user has a placed order, an item in the cart and
+    a forum post, so every page has something to render
+    """
+    client.get('/add_to_cart/1')
+    client.get('/add_to_cart/2')
+    client.get('/checkout')
+    client.get('/add_to_cart/3')
+    client.post('/forum/create', data={'title': 'Which urea dose for paddy?', 'content': 'Two acres, clay soil.',
+                                       'category': 'crops'})
+    return client
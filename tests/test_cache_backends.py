@@ -0,0 +1,107 @@
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.fake_redis import FakeRedisServer
+from cache import RedisCache, SQLiteCache, create_cache
+
+
+@pytest.fixture(scope='module')
+def redis_server():
+    server = FakeRedisServer(('127.0.0.1', 0), password='hunter2').start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def backend(request, redis_server, tmp_path):
+    host, port = redis_server.server_address[:2]
+    urls = {
+        'memory': 'memory://?max_entries=100',
+        'sqlite': f"sqlite:///{tmp_path / 'cache.db'}",
+        'redis': f'redis://:hunter2@{host}:{port}/3?prefix={tmp_path.name}:',
+    }
+    cache = create_cache(urls[request.param])
+    yield cache
+    cache.clear()
+
+
+def test_round_trips_json_values(backend):
+    backend.set('forecast:pune', {'temp': [31.5, 30.0], 'city': 'Pune'})
+    assert backend.get('forecast:pune') == {'temp': [31.5, 30.0], 'city': 'Pune'}
+    assert backend.get('missing') is None
+
+
+def test_add_only_sets_missing_keys(backend):
+    assert backend.add('lock', 1, ttl=30)
+    assert not backend.add('lock', 2, ttl=30)
+    assert backend.get('lock') == 1
+
+
+def test_entries_expire(backend):
+    backend.set('short', 'x', ttl=0.05)
+    backend.incr('counter', ttl=0.05)
+    time.sleep(0.1)
+    assert backend.get('short') is None
+    assert backend.add('short', 'y')
+    assert backend.incr('counter') == 1
+
+
+def test_incr_counts_concurrent_calls(backend):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: backend.incr('hits', ttl=60), range(200)))
+    assert backend.incr('hits') == 201
+
+
+def test_delete_and_clear(backend):
+    for key in ('a', 'b', 'c'):
+        backend.set(key, key)
+    backend.delete('a')
+    assert backend.get('a') is None
+    backend.clear()
+    assert backend.get('b') is None and backend.get('c') is None
+
+
+def test_redis_clear_keeps_other_prefixes(redis_server):
+    host, port = redis_server.server_address[:2]
+    ours = RedisCache(host, port, db=4, password='hunter2', prefix='ours:')
+    theirs = RedisCache(host, port, db=4, password='hunter2', prefix='theirs:')
+    ours.set('k', 1)
+    theirs.set('k', 2)
+    ours.clear()
+    assert ours.get('k') is None
+    assert theirs.get('k') == 2
+
+
+def test_sqlite_errors_are_not_raised(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'broken.db'))
+    with sqlite3.connect(str(tmp_path / 'broken.db')) as conn:
+        conn.execute('DROP TABLE cache')
+    cache.set('k', 1)
+    assert cache.get('k') is None
+    assert cache.incr('k') == 0
+    cache.delete('k')
+    cache.clear()
+
+
+def test_redis_errors_are_not_raised():
+    # Nothing listens on the port of a server that has just been closed
+    server = FakeRedisServer(('127.0.0.1', 0))
+    port = server.server_address[1]
+    server.server_close()
+    cache = RedisCache('127.0.0.1', port, timeout=0.2)
+    cache.set('k', 1)
+    assert cache.get('k') is None
+    assert not cache.add('k', 1)
+    assert cache.incr('k') == 0
+    cache.delete('k')
+    cache.clear()
+
+
+def test_redis_wrong_password_is_not_raised(redis_server):
+    host, port = redis_server.server_address[:2]
+    cache = RedisCache(host, port, password='wrong')
+    assert cache.get('k') is None
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import app as farmers
+from conftest import signed_in_client
+
+THREADS = 16
+TAPS = 10
+
+
+def test_concurrent_adds_count_exactly_once(user):
+    product_id = 1
+
+    def tap(_):
+        client = signed_in_client(user['id'])
+        return [client.get(f'/add_to_cart/{product_id}').status_code for _ in range(TAPS)]
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        statuses = [status for result in executor.map(tap, range(THREADS)) for status in result]
+
+    assert statuses == [302] * THREADS * TAPS
+    with farmers.app.app_context():
+        rows = [row.quantity for row in farmers.Order.query.filter_by(
+            user_id=user['id'], product_id=product_id, status='Cart')]
+    assert rows == [THREADS * TAPS]
+
+
+def test_checkout_of_empty_cart_goes_back_to_shop(client):
+    response = client.get('/checkout')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/shop')
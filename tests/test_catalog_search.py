@@ -0,0 +1,17 @@
+import app as farmers
+
+
+def test_query_without_words_does_not_filter():
+    with farmers.app.app_context():
+        everything, _ = farmers.search_catalog('', sort='name')
+        assert everything
+        assert farmers.search_catalog('!!!', sort='name') == farmers.search_catalog('', sort='name')
+        assert farmers.search_catalog('!!!', sort='relevance')[0] == everything
+
+
+def test_shop_lists_products_for_punctuation_query(client):
+    response = client.get('/shop?q=!!!')
+    assert response.status_code == 200
+    with farmers.app.app_context():
+        name = farmers.search_catalog('', sort='name')[0][0].name
+    assert name in response.get_data(as_text=True)
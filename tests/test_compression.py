@@ -0,0 +1,33 @@
+import gzip
+
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from compression import CompressionMiddleware
+
+BODY = 'paddy ' * 500
+
+
+def client_for(status, headers=None):
+    def app(environ, start_response):
+        return Response(BODY, status=status, headers=headers, mimetype='text/plain')(environ, start_response)
+    return Client(CompressionMiddleware(app))
+
+
+def test_full_response_is_compressed():
+    response = client_for(200).get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).decode() == BODY
+
+
+def test_partial_content_is_not_compressed():
+    response = client_for(206, {'Content-Range': f'bytes 0-{len(BODY) - 1}/{len(BODY) * 2}'}).get(
+        '/', headers={'Accept-Encoding': 'gzip', 'Range': f'bytes=0-{len(BODY) - 1}'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data(as_text=True) == BODY
+
+
+def test_content_range_is_not_compressed():
+    response = client_for(416, {'Content-Range': f'bytes */{len(BODY)}'}).get(
+        '/', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
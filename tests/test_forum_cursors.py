@@ -0,0 +1,15 @@
+import app as farmers
+
+
+def test_cursor_round_trips():
+    post = farmers.ForumPost(id=7, comment_count=3)
+    assert farmers.decode_cursor(farmers.encode_cursor(post, 'popular'), 'popular') == (3, 7)
+
+
+def test_date_cursor_is_rejected_for_popular_sort(shopper):
+    with farmers.app.app_context():
+        post = farmers.ForumPost.query.first()
+        date_cursor = farmers.encode_cursor(post, 'newest')
+    assert farmers.decode_cursor(date_cursor, 'popular') is None
+    response = shopper.get(f'/forum?sort=popular&after={date_cursor}')
+    assert response.status_code == 200
@@ -0,0 +1,25 @@
+import app as farmers
+
+
+def test_new_post_is_ranked_when_comments_outnumber_posts(user):
+    with farmers.app.app_context():
+        old_posts = [farmers.ForumPost(title=f'Old thread {i}', content='Sowing paddy this season',
+                                       user_id=user['id']) for i in range(600)]
+        farmers.db.session.add_all(old_posts)
+        farmers.db.session.flush()
+        farmers.db.session.add_all(
+            farmers.ForumComment(content=f'My paddy is fine, reply {n}', post_id=post.id, user_id=user['id'])
+            for post in old_posts for n in range(3))
+        new_post = farmers.ForumPost(title='Paddy blast outbreak today', content='Leaves are spotted',
+                                     user_id=user['id'])
+        farmers.db.session.add(new_post)
+        farmers.db.session.commit()
+        try:
+            results = farmers.search_forum(farmers.db.session.connection(), 'paddy')
+            assert new_post.id in [post_id for post_id, snippet in results]
+        finally:
+            farmers.ForumComment.query.filter(
+                farmers.ForumComment.post_id.in_([post.id for post in old_posts])).delete()
+            farmers.ForumPost.query.filter(
+                farmers.ForumPost.id.in_([post.id for post in old_posts] + [new_post.id])).delete()
+            farmers.db.session.commit()
@@ -0,0 +1,14 @@
+def test_rejected_request_is_not_replayed(client):
+    headers = {'Idempotency-Key': 'add-urea-1'}
+    rejected = client.post('/api/cart/items', json={'product_id': 'urea'}, headers=headers)
+    assert rejected.status_code == 400
+
+    corrected = client.post('/api/cart/items', json={'product_id': 1, 'quantity': 2}, headers=headers)
+    assert corrected.status_code == 200
+    assert 'Idempotent-Replayed' not in corrected.headers
+    assert corrected.get_json()['item_count'] == 2
+
+    retried = client.post('/api/cart/items', json={'product_id': 1, 'quantity': 2}, headers=headers)
+    assert retried.headers['Idempotent-Replayed'] == 'true'
+    assert retried.get_json() == corrected.get_json()
+    assert client.get('/api/cart').get_json()['item_count'] == 2
@@ -0,0 +1,30 @@
+import app as farmers
+
+ATTACKER = {'REMOTE_ADDR': '203.0.113.7'}
+OWNER = {'REMOTE_ADDR': '198.51.100.20'}
+
+
+def sign_in(client, user, password, environ):
+    return client.post('/login', data={'username': user['username'], 'password': password},
+                       environ_base=environ)
+
+
+def test_failures_block_only_the_guessing_address(user):
+    attacker = farmers.app.test_client()
+    limit = farmers.app.config['LOGIN_MAX_FAILURES_PER_USER']
+    statuses = [sign_in(attacker, user, 'wrong', ATTACKER).status_code for _ in range(limit + 1)]
+    assert statuses == [200] * limit + [429]
+    assert sign_in(attacker, user, user['password'], ATTACKER).status_code == 429
+
+    response = sign_in(farmers.app.test_client(), user, user['password'], OWNER)
+    assert response.status_code == 302
+    assert response.location.endswith('/dashboard')
+
+
+def test_address_limit_spans_usernames():
+    client = farmers.app.test_client()
+    environ = {'REMOTE_ADDR': '192.0.2.99'}
+    limit = farmers.app.config['LOGIN_MAX_FAILURES_PER_IP']
+    statuses = [client.post('/login', data={'username': f'nobody{n}', 'password': 'x'},
+                            environ_base=environ).status_code for n in range(limit + 1)]
+    assert statuses == [200] * limit + [429]
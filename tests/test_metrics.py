@@ -0,0 +1,36 @@
+import os
+
+from metrics import Counter, MetricsRegistry, clear_directory
+
+
+def test_recycled_pid_keeps_exited_workers_totals(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, 'getpid', lambda: 4242)
+    for hits in (3, 5):
+        # Two workers that got the same pid one after the other
+        registry = MetricsRegistry(str(tmp_path))
+        counter = Counter(registry, 'hits_total', 'Hits')
+        counter.inc(hits)
+        registry.flush()
+
+    assert len(os.listdir(tmp_path)) == 2
+    assert registry.collect()['hits_total'] == {'[]': 8}
+
+
+def test_forked_worker_gets_its_own_file(tmp_path, monkeypatch):
+    registry = MetricsRegistry(str(tmp_path))
+    Counter(registry, 'hits_total', 'Hits').inc()
+    registry.flush()
+    # After a fork the same registry is flushed from another pid
+    monkeypatch.setattr(os, 'getpid', lambda: 1)
+    registry.flush()
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_clear_directory_removes_worker_files(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    Counter(registry, 'hits_total', 'Hits').inc()
+    registry.flush()
+    (tmp_path / 'worker-1-abc.json.tmp').write_text('{')
+    clear_directory(str(tmp_path))
+    assert os.listdir(tmp_path) == []
+    clear_directory(str(tmp_path / 'missing'))
@@ -0,0 +1,54 @@
+import importlib.util
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+MIGRATION = Path(__file__).parent.parent / 'migrations' / 'versions' / 'f7c2d5e8a1b3_add_order_headers_and_stock.py'
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location('order_headers_migration', MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_backfill_groups_lines_of_one_legacy_checkout(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    started = datetime(2024, 3, 1, 9, 30)
+    with engine.begin() as connection:
+        connection.exec_driver_sql('CREATE TABLE user (id INTEGER PRIMARY KEY)')
+        connection.exec_driver_sql('CREATE TABLE product (id INTEGER PRIMARY KEY, price FLOAT)')
+        connection.exec_driver_sql(
+            'CREATE TABLE "order" (id INTEGER PRIMARY KEY, user_id INTEGER, product_id INTEGER, '
+            'quantity INTEGER, status VARCHAR(20), order_date DATETIME)')
+        connection.exec_driver_sql('INSERT INTO user (id) VALUES (1), (2)')
+        connection.exec_driver_sql('INSERT INTO product (id, price) VALUES (1, 10.0), (2, 25.0)')
+        # The old checkout gave every line its own utcnow(), a few milliseconds apart
+        lines = [
+            (1, 1, 1, 2, 'Ordered', started),
+            (2, 1, 2, 1, 'Ordered', started + timedelta(milliseconds=3)),
+            (3, 1, 1, 1, 'Ordered', started + timedelta(milliseconds=7)),
+            (4, 1, 2, 4, 'Ordered', started + timedelta(days=2)),
+            (5, 2, 1, 1, 'Ordered', started + timedelta(milliseconds=5)),
+            (6, 1, 1, 9, 'Cart', None),
+        ]
+        connection.execute(sa.text(
+            'INSERT INTO "order" (id, user_id, product_id, quantity, status, order_date) '
+            'VALUES (:id, :user_id, :product_id, :quantity, :status, :order_date)'),
+            [dict(zip(('id', 'user_id', 'product_id', 'quantity', 'status', 'order_date'), line))
+             for line in lines])
+
+        with Operations.context(MigrationContext.configure(connection)):
+            load_migration().upgrade()
+
+        headers = connection.exec_driver_sql(
+            'SELECT user_id, item_count, total FROM order_header ORDER BY user_id, created_at').all()
+        assert headers == [(1, 4, 55.0), (1, 4, 100.0), (2, 1, 10.0)]
+        header_ids = dict(connection.exec_driver_sql('SELECT id, header_id FROM "order"').all())
+        assert header_ids[1] == header_ids[2] == header_ids[3]
+        assert len({header_ids[1], header_ids[4], header_ids[5]}) == 3
+        assert header_ids[6] is None
@@ -0,0 +1,25 @@
+import pytest
+
+import app as farmers
+
+# Most bytes each page may send gzip-compressed; a product grid or a thread
+# list growing past this usually means a page is missing pagination
+PAGE_PAYLOAD_BUDGETS = {
+    '/dashboard': 8000,
+    '/forum': 6000,
+    '/cart': 4000,
+    '/orders': 6000,
+    '/shop': 10000,
+    '/api/cart': 2000,
+}
+
+
+@pytest.mark.parametrize('path', PAGE_PAYLOAD_BUDGETS)
+def test_page_stays_within_payload_budget(shopper, path):
+    farmers.compression.reset_sizes()
+    response = shopper.get(path, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+
+    rule = farmers.app.url_map.bind('localhost').match(path, return_rule=True)[0].rule
+    sizes = farmers.compression.sizes[rule]
+    assert sizes['max_sent'] <= PAGE_PAYLOAD_BUDGETS[path], sizes
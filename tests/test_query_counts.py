@@ -0,0 +1,15 @@
+import pytest
+
+import app as farmers
+from instrumentation import assert_max_queries
+
+
+@pytest.mark.parametrize('path', farmers.PAGE_QUERY_BUDGETS)
+def test_page_stays_within_query_budget(shopper, user, path):
+    # The budget allows for the user lookup, so measure with the user cache cold
+    farmers.app_cache.delete(farmers.user_cache_key(user['id']))
+    with farmers.app.app_context():
+        engine = farmers.db.engine
+    with assert_max_queries(engine, farmers.PAGE_QUERY_BUDGETS[path]):
+        response = shopper.get(path)
+    assert response.status_code == 200
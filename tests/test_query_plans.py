@@ -0,0 +1,13 @@
+import pytest
+
+import app as farmers
+
+with farmers.app.app_context():
+    HOT_QUERIES = list(farmers.hot_queries())
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+def test_hot_query_uses_an_index(name):
+    with farmers.app.app_context():
+        plan = farmers.query_plan(farmers.hot_queries()[name])
+    assert not farmers.is_full_scan(plan), plan
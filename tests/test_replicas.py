@@ -0,0 +1,42 @@
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+from replicas import RoutingSession, wrote_primary
+
+
+@pytest.fixture
+def routed_db(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'primary.db'}"
+    app.config['SQLALCHEMY_BINDS'] = {'replica1': f"sqlite:///{tmp_path / 'replica.db'}"}
+    db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+    with app.app_context():
+        for engine, body in ((db.engine, 'primary'), (db.engines['replica1'], 'replica')):
+            with engine.begin() as connection:
+                connection.exec_driver_sql('CREATE TABLE note (id INTEGER PRIMARY KEY, body TEXT)')
+                connection.execute(text('INSERT INTO note (id, body) VALUES (1, :body)'), {'body': body})
+        yield db
+
+
+def read_note(session):
+    return session.execute(text('SELECT body FROM note WHERE id = 1')).scalar()
+
+
+def test_text_update_sticks_to_primary(routed_db):
+    session = routed_db.session()
+    session.use_replica()
+    assert read_note(session) == 'replica'
+
+    session.execute(text("UPDATE note SET body = 'updated' WHERE id = 1"))
+    assert wrote_primary(session)
+    assert read_note(session) == 'updated'
+    session.commit()
+
+
+def test_reads_alone_are_not_writes(routed_db):
+    session = routed_db.session()
+    session.use_replica()
+    assert read_note(session) == 'replica'
+    assert not wrote_primary(session)
@@ -0,0 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import app as farmers
+
+
+def test_concurrent_misses_make_one_upstream_call(weather_api):
+    location = 'Nashik'
+    with ThreadPoolExecutor(max_workers=50) as executor:
+        results = list(executor.map(farmers.get_weather_data, [location] * 50))
+
+    assert weather_api.requests == 1
+    assert all(not result.get('is_mock') for result in results)
+    assert len({result['temperature'] for result in results}) == 1
@@ -0,0 +1,13 @@
+import app as farmers
+
+
+def test_unknown_location_is_asked_once(weather_api):
+    weather_api.unknown_locations.add('atlantis')
+    try:
+        results = [farmers.get_weather_data('Atlantis, IN') for _ in range(5)]
+    finally:
+        weather_api.unknown_locations.discard('atlantis')
+
+    assert weather_api.requests == 1
+    assert all(result['is_mock'] for result in results)
+    assert farmers.weather_client.breaker.state == farmers.weather_client.breaker.CLOSED
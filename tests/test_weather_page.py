@@ -0,0 +1,14 @@
+import app as farmers
+from benchmarks.fake_weather import forecast_payload
+
+
+def test_weather_is_labelled_as_next_forecast_slot(weather_api, client):
+    slot = forecast_payload('Nashik,IN')['list'][0]
+    weather = farmers.get_weather_data('Nashik,IN')
+    assert weather['temperature'] == round(slot['main']['temp'])
+    assert weather['rainfall'] == slot.get('rain', {}).get('3h', 0)
+    assert weather['rainfall_hours'] == 3
+
+    page = client.get('/weather?location=Nashik,IN').get_data(as_text=True)
+    assert 'Next 3 hours' in page
+    assert 'mm in the next 3 hours' in page
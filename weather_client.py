@@ -0,0 +1,117 @@
+"""
+HTTP client for the OpenWeatherMap API.
+
+One pooled keep-alive requests.Session is shared by every request in the
+worker, and a circuit breaker stops calling the API after repeated failures
+so callers can fall back to mock data straight away instead of waiting on
+timeouts.
+"""
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class WeatherUnavailable(Exception):
+    """Raised when the circuit breaker is open and the API is not called."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open every call
+    is rejected; after `reset_timeout` seconds one trial call is let through and
+    its outcome closes the breaker again or re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let exactly one trial call through
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class WeatherClient:
+    """
+    OpenWeatherMap client built on a pooled keep-alive session
+    """
+
+    def __init__(self, api_key, base_url, connect_timeout=2, read_timeout=5,
+                 pool_connections=4, pool_maxsize=32, failure_threshold=5, reset_timeout=30):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        # No automatic retries: a retry doubles the wait when the API is slow,
+        # and the caller already has fallback data
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              max_retries=0)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, endpoint, **params):
+        """
+        Call an API endpoint (e.g. 'weather') and return the decoded JSON.
+        Raises WeatherUnavailable while the circuit is open, and requests
+        exceptions for failed calls.
+        """
+        if not self.breaker.allow_request():
+            raise WeatherUnavailable(f'Weather API circuit is {self.breaker.state}')
+
+        params.update(appid=self.api_key, units='metric')
+        try:
+            response = self.session.get(f'{self.base_url}/{endpoint}', params=params,
+                                        timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except requests.exceptions.HTTPError as e:
+            # 4xx (e.g. unknown city) means the API itself is healthy
+            status = e.response.status_code if e.response is not None else 500
+            if status >= 500 or status == 429:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except (requests.exceptions.RequestException, ValueError):
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        return data
+
+    def current_weather(self, location):
+        return self.get('weather', q=location)
+
+    def forecast(self, location):
+        """5-day forecast in 3-hour steps (40 slots)"""
+        return self.get('forecast', q=location)